@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from metrics import histogram
+
+# SQLite database replacing the old rewrite-the-whole-file JSON log
+ALERTS_DB_FILE = "driver_alerts.db"
+# Legacy JSON alert log (newest alert first), migrated once on first open
+LEGACY_ALERTS_FILE = "driver_alerts.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    driver_id TEXT,
+    status TEXT,
+    duration REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts(timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_driver ON alerts(driver_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts(status, timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total_duration REAL NOT NULL,
+    PRIMARY KEY (scope, key)
+) WITHOUT ROWID;
+"""
+
+WRITE_SECONDS = histogram("alert_store_write_seconds", "Time to append alerts (with rollups) in one transaction")
+
+INSERT_SQL = "INSERT INTO alerts (timestamp, driver_id, status, duration, payload) VALUES (?, ?, ?, ?, ?)"
+
+# Running counts / duration sums per scope, bumped in the same transaction as each insert
+ROLLUP_SQL = """
+INSERT INTO rollups (scope, key, count, total_duration) VALUES (?, ?, 1, ?)
+ON CONFLICT (scope, key) DO UPDATE SET
+    count = count + 1,
+    total_duration = total_duration + excluded.total_duration
+"""
+
+# scope -> SQL expression over the alerts table; timestamps are "YYYY-MM-DD HH:MM:SS"
+ROLLUP_SCOPES = {
+    "all": "''",
+    "status": "COALESCE(status, '')",
+    "driver": "COALESCE(driver_id, '')",
+    "day": "substr(timestamp, 1, 10)",
+    "hour": "substr(timestamp, 1, 13)",
+}
+
+
+class AlertStore:
+    """Append-only alert log backed by SQLite in WAL mode"""
+
+    def __init__(self, path=ALERTS_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode: every append is its own short transaction
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._build_rollups()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_values(alert):
+        driver = alert.get("driver") or {}
+        return (
+            alert.get("timestamp", ""),
+            driver.get("id"),
+            alert.get("status"),
+            alert.get("duration"),
+            json.dumps(alert),
+        )
+
+    @staticmethod
+    def _rollup_values(values):
+        timestamp, driver_id, status, duration = values[:4]
+        duration = duration or 0.0
+        return [
+            ("all", "", duration),
+            ("status", status or "", duration),
+            ("driver", driver_id or "", duration),
+            ("day", timestamp[:10], duration),
+            ("hour", timestamp[:13], duration),
+        ]
+
+    def _insert(self, alerts):
+        """Insert rows and bump their rollups; caller holds the lock and a transaction"""
+        last_id = None
+        for alert in alerts:
+            values = self._row_values(alert)
+            last_id = self._conn.execute(INSERT_SQL, values).lastrowid
+            self._conn.executemany(ROLLUP_SQL, self._rollup_values(values))
+        return last_id
+
+    def append(self, alert):
+        """Append a single alert and return its row id"""
+        return self.append_many([alert])
+
+    def append_many(self, alerts):
+        """Append alerts (oldest first) in a single transaction; returns the last row id"""
+        with self._lock, WRITE_SECONDS.time():
+            self._conn.execute("BEGIN")
+            try:
+                last_id = self._insert(alerts)
+                self._conn.execute("COMMIT")
+                return last_id
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def append_ingested(self, cursor_key, seq, alerts):
+        """Append [(seq, alert)] newer than the cursor in meta `cursor_key`, then move it to `seq`.
+
+        Read, insert and cursor update share one write transaction, so a
+        re-sent upload (even to another dashboard process) never stores an
+        alert twice. Returns the number of alerts appended.
+        """
+        with self._lock, WRITE_SECONDS.time():
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (cursor_key,)).fetchone()
+                cursor = int(row[0]) if row else 0
+                fresh = [alert for alert_seq, alert in alerts if alert_seq > cursor]
+                self._insert(fresh)
+                if seq > cursor:
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                       (cursor_key, str(seq)))
+                self._conn.execute("COMMIT")
+                return len(fresh)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_alerts(self, limit=50, before_id=None, driver_id=None, status=None, since=None, until=None):
+        """Return alerts newest first, optionally filtered and paginated by id"""
+        clauses = []
+        params = []
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if driver_id is not None:
+            clauses.append("driver_id = ?")
+            params.append(driver_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp <= ?")
+            params.append(until)
+
+        query = "SELECT id, payload FROM alerts"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        alerts = []
+        for row_id, payload in rows:
+            alert = json.loads(payload)
+            alert["id"] = row_id
+            alerts.append(alert)
+        return alerts
+
+    def import_legacy(self, alerts, source):
+        """Import legacy alerts exactly once, even if several processes race"""
+        with self._lock:
+            # IMMEDIATE takes the write lock before the marker check
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone()
+                if row:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._insert(alerts)
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)", (source,))
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+
+    def _build_rollups(self):
+        """Backfill rollups once for databases created before they existed"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM meta WHERE key = 'rollups_built'").fetchone():
+                    self._conn.execute("ROLLBACK")
+                    return
+                self._conn.execute("DELETE FROM rollups")
+                for scope, expr in ROLLUP_SCOPES.items():
+                    self._conn.execute(
+                        f"INSERT INTO rollups (scope, key, count, total_duration) "
+                        f"SELECT ?, {expr}, COUNT(*), COALESCE(SUM(duration), 0) FROM alerts GROUP BY {expr}",
+                        (scope,))
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollups_built', '1')")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def rollups(self, scope, since=None):
+        """{key: (count, mean_duration)} for one scope, optionally only keys >= since"""
+        query = "SELECT key, count, total_duration FROM rollups WHERE scope = ?"
+        params = [scope]
+        if since is not None:
+            query += " AND key >= ?"
+            params.append(since)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return {key: (count, total / count if count else 0.0) for key, count, total in rows}
+
+    def stats(self, hours=24, days=30):
+        """Fleet summary from the rollups: totals, per status / driver, recent hours and days"""
+        now = time.time()
+        since_hour = time.strftime("%Y-%m-%d %H", time.localtime(now - (hours - 1) * 3600))
+        since_day = time.strftime("%Y-%m-%d", time.localtime(now - (days - 1) * 86400))
+
+        def section(rows):
+            return {key: {"count": count, "mean_duration": round(mean, 2)} for key, (count, mean) in sorted(rows.items())}
+
+        count, mean = self.rollups("all").get("", (0, 0.0))
+        return {
+            "total": {"count": count, "mean_duration": round(mean, 2)},
+            "by_status": section(self.rollups("status")),
+            "by_driver": section(self.rollups("driver")),
+            "by_hour": section(self.rollups("hour", since_hour)),
+            "by_day": section(self.rollups("day", since_day)),
+        }
+
+    def last_id(self):
+        """Id of the newest alert (0 when empty); changes whenever an alert is appended"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM alerts").fetchone()[0]
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def migrate_json(store, json_path=LEGACY_ALERTS_FILE):
+    """One-shot import of the legacy JSON alert log into the store"""
+    if store.get_meta("migrated_from_json") or not os.path.exists(json_path):
+        return 0
+
+    try:
+        with open(json_path, "r") as f:
+            alerts = json.load(f)
+    except Exception as e:
+        print(f"Error reading legacy alerts file: {e}")
+        return 0
+
+    # The JSON log keeps the newest alert first; the store is append-only
+    alerts = list(reversed(alerts))
+    if not store.import_legacy(alerts, json_path):
+        return 0
+
+    try:
+        os.replace(json_path, json_path + ".migrated")
+    except OSError as e:
+        print(f"Could not rename legacy alerts file: {e}")
+    print(f"Migrated {len(alerts)} alerts from {json_path} to {store.path}")
+    return len(alerts)
+
+
+def open_store(path=ALERTS_DB_FILE, legacy_path=LEGACY_ALERTS_FILE):
+    """Open the alert store, migrating the legacy JSON log if present"""
+    store = AlertStore(path)
+    migrate_json(store, legacy_path)
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python alert_store.py [legacy_json] [database]
+    legacy = sys.argv[1] if len(sys.argv) > 1 else LEGACY_ALERTS_FILE
+    database = sys.argv[2] if len(sys.argv) > 2 else ALERTS_DB_FILE
+    s = AlertStore(database)
+    migrated = migrate_json(s, legacy)
+    print(f"{migrated} alerts migrated, {s.count()} alerts in {database}")
+    s.close()
@@ -0,0 +1,80 @@
+import threading
+from collections import deque
+from engineio import packet as eio_packet
+
+
+class ClientSendBuffers:
+    """Per-client send buffers with drop-oldest backpressure for Socket.IO broadcasts.
+
+    Engine.IO queues outgoing packets per client without limit, so one slow
+    browser (throttled tab, bad mobile link) makes the server hold every
+    broadcast it has not read yet. Once a client has `max_pending` packets
+    waiting in its transport queue, further event packets go to a bounded
+    buffer of `max_buffered` packets instead; when that is full the oldest
+    packet is dropped. `flush()` moves buffered packets on as the client
+    catches up. Control packets (connect, ack, ping) always pass straight
+    through.
+    """
+
+    def __init__(self, eio_server, max_pending=32, max_buffered=64):
+        self.eio = eio_server
+        self.max_pending = max_pending
+        self.max_buffered = max_buffered
+        self.buffers = {}
+        self.dropped = 0
+        self._send = eio_server.send_packet
+        self._lock = threading.Lock()
+
+    def install(self):
+        """Route the Engine.IO server's outgoing packets through the buffers"""
+        self.eio.send_packet = self.send_packet
+        return self
+
+    def _pending(self, sid):
+        socket = self.eio.sockets.get(sid)
+        return None if socket is None else socket.queue.qsize()
+
+    def send_packet(self, sid, pkt):
+        # Socket.IO EVENT packets are the only ones that may be delayed or dropped
+        is_event = pkt.packet_type == eio_packet.MESSAGE and isinstance(pkt.data, str) and pkt.data[:1] == "2"
+        if not is_event:
+            self._send(sid, pkt)
+            return
+        with self._lock:
+            buffer = self.buffers.get(sid)
+            if buffer is None:
+                pending = self._pending(sid)
+                if pending is None or pending < self.max_pending:
+                    self._send(sid, pkt)
+                    return
+                buffer = self.buffers[sid] = deque(maxlen=self.max_buffered)
+            if len(buffer) == buffer.maxlen:
+                self.dropped += 1
+            buffer.append(pkt)
+
+    def flush(self):
+        """Hand buffered packets to clients whose transport queues have drained"""
+        with self._lock:
+            sids = list(self.buffers)
+        for sid in sids:
+            # Sending under the lock keeps buffered packets ahead of newer ones
+            with self._lock:
+                buffer = self.buffers.get(sid)
+                pending = self._pending(sid)
+                if buffer is None:
+                    continue
+                if pending is None:
+                    # Client disconnected
+                    del self.buffers[sid]
+                    continue
+                while buffer and pending < self.max_pending:
+                    self._send(sid, buffer.popleft())
+                    pending += 1
+                if not buffer:
+                    del self.buffers[sid]
+
+    def stats(self):
+        with self._lock:
+            return {"buffering_clients": len(self.buffers),
+                    "buffered": sum(len(b) for b in self.buffers.values()),
+                    "dropped": self.dropped}
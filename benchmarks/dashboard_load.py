@@ -0,0 +1,119 @@
+"""Load test for the dashboard: simulated trucks posting locations and alerts.
+
+Each simulated truck posts a location batch every `--interval` seconds and
+an alert now and then, all over keep-alive sessions from a thread pool.
+Reports sustained POSTs/sec, p50/p99 request latency and errors per
+endpoint. Start the dashboard first, preferably the way it runs in
+production (e.g. DASHBOARD_ASYNC_MODE=eventlet python dashboard.py).
+
+Usage (from the project root):
+    python -m benchmarks.dashboard_load --trucks 200 --duration 30
+    python -m benchmarks.dashboard_load --url http://10.0.0.5:5000 --interval 0 --threads 64
+"""
+import argparse
+import random
+import threading
+import time
+import numpy as np
+import requests
+from telemetry import encode_fixes
+
+ALERT_STATUSES = ("SLEEPING !!!", "Drowsy !")
+
+
+def truck_payloads(truck, fixes_per_batch, alert_rate, rng):
+    """Endless (path, payload) stream for one truck driving a random walk"""
+    driver = {"name": f"Driver {truck}", "id": f"LOAD{truck:04d}", "phone": "0000000000",
+              "vehicle": f"TRK-{truck:04d}"}
+    latitude = 13.0 + rng.random()
+    longitude = 80.0 + rng.random()
+    while True:
+        now = time.time()
+        fixes = []
+        for i in range(fixes_per_batch):
+            latitude += rng.uniform(-1e-4, 1e-4)
+            longitude += rng.uniform(-1e-4, 1e-4)
+            fixes.append((now - (fixes_per_batch - i), latitude, longitude))
+        yield "/location_batch", encode_fixes(fixes, driver["id"], f"Load test road {truck}")
+        if rng.random() < alert_rate:
+            yield "/alert", {
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "driver": driver,
+                "status": rng.choice(ALERT_STATUSES),
+                "duration": round(rng.uniform(5, 15), 2),
+                "location": {"latitude": latitude, "longitude": longitude, "address": "Load test"},
+            }
+
+
+def worker(url, trucks, interval, deadline, results, lock, seed):
+    """Round-robin over this thread's trucks until the deadline"""
+    rng = random.Random(seed)
+    session = requests.Session()
+    streams = [truck_payloads(truck, 5, 0.05, rng) for truck in trucks]
+    latencies = {}
+    errors = {}
+    while time.time() < deadline:
+        round_start = time.perf_counter()
+        for stream in streams:
+            path, payload = next(stream)
+            start = time.perf_counter()
+            try:
+                ok = session.post(url + path, json=payload, timeout=10).status_code == 200
+            except requests.RequestException:
+                ok = False
+            latencies.setdefault(path, []).append(time.perf_counter() - start)
+            if not ok:
+                errors[path] = errors.get(path, 0) + 1
+            if time.time() >= deadline:
+                break
+        remaining = interval - (time.perf_counter() - round_start)
+        if remaining > 0:
+            time.sleep(remaining)
+    session.close()
+    with lock:
+        for path, values in latencies.items():
+            results["latencies"].setdefault(path, []).extend(values)
+        for path, count in errors.items():
+            results["errors"][path] = results["errors"].get(path, 0) + count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--trucks", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between batches per truck (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/")
+    threads = min(args.threads, args.trucks)
+    results = {"latencies": {}, "errors": {}}
+    lock = threading.Lock()
+    deadline = time.time() + args.duration
+    pool = [
+        threading.Thread(target=worker, args=(url, list(range(t, args.trucks, threads)), args.interval,
+                                              deadline, results, lock, t))
+        for t in range(threads)
+    ]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(v) for v in results["latencies"].values())
+    total_errors = sum(results["errors"].values())
+    print(f"{args.trucks} trucks, {threads} threads, {elapsed:.1f} s: "
+          f"{total} POSTs, {total / elapsed:.1f} POSTs/sec, {total_errors} errors")
+    for path, values in sorted(results["latencies"].items()):
+        ms = np.array(values) * 1000
+        print(f"  {path:<16} {len(values):7d} req  {len(values) / elapsed:8.1f}/s  "
+              f"p50 {np.percentile(ms, 50):7.2f} ms  p99 {np.percentile(ms, 99):7.2f} ms  "
+              f"errors {results['errors'].get(path, 0)}")
+
+
+if __name__ == "__main__":
+    main()
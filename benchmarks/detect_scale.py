@@ -0,0 +1,94 @@
+"""Detector cost and EAR error of downscaled face detection.
+
+Each scale's detections are mapped back to full resolution and fed to the
+68-point predictor; the resulting EAR is compared with the EAR obtained
+from full-resolution detection on the same frame.
+
+Usage (from the project root):
+    python -m benchmarks.detect_scale clip.mp4 --scales 1 0.5 0.33
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+import dlib
+from ear import get_ear, shape_to_eye_points
+from face_tracker import ScaledDetector
+
+SHAPE_PREDICTOR_PATH = "./shape_predictor_68_face_landmarks.dat"
+
+
+def load_frames(source, max_frames):
+    """Read up to `max_frames` grayscale frames from a video file or camera index"""
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    cap.release()
+    return frames
+
+
+def largest(faces):
+    return max(faces, key=lambda r: r.width() * r.height()) if faces else None
+
+
+def face_ear(predictor, gray, face):
+    return get_ear(shape_to_eye_points(predictor(gray, face)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="video file or camera index")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.5, 0.33])
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        raise SystemExit(f"No frames read from {args.source}")
+
+    base = dlib.get_frontal_face_detector()
+    predictor = dlib.shape_predictor(SHAPE_PREDICTOR_PATH)
+
+    # Reference EAR from full-resolution detection
+    reference = []
+    for gray in frames:
+        face = largest(list(base(gray)))
+        reference.append(face_ear(predictor, gray, face) if face is not None else None)
+    with_face = sum(r is not None for r in reference)
+
+    print(f"{len(frames)} frames, {with_face} with a face at full resolution")
+    print(f"{'scale':>6} {'detect ms':>10} {'speedup':>8} {'mean |dEAR|':>12} {'p95 |dEAR|':>11} {'max |dEAR|':>11} {'missed':>7}")
+
+    baseline_ms = None
+    for scale in args.scales:
+        detector = ScaledDetector(base, scale)
+        times = []
+        errors = []
+        missed = 0
+        for gray, ref_ear in zip(frames, reference):
+            start = time.perf_counter()
+            faces = detector(gray)
+            times.append(time.perf_counter() - start)
+            if ref_ear is None:
+                continue
+            face = largest(faces)
+            if face is None:
+                missed += 1
+                continue
+            errors.append(abs(face_ear(predictor, gray, face) - ref_ear))
+
+        detect_ms = 1000 * float(np.mean(times))
+        if baseline_ms is None:
+            baseline_ms = detect_ms
+        errors = np.array(errors) if errors else np.array([np.nan])
+        print(f"{scale:>6.2f} {detect_ms:>10.2f} {baseline_ms / detect_ms:>7.2f}x "
+              f"{np.mean(errors):>12.4f} {np.percentile(errors, 95):>11.4f} {np.max(errors):>11.4f} "
+              f"{missed:>7d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Per-frame EAR cost: shape_to_np + scalar EAR vs eye-only vectorized EAR.
+
+Uses synthetic dlib shapes, so no camera, clip or predictor file is needed.
+
+Usage (from the project root):
+    python -m benchmarks.ear --faces 1 --iterations 20000
+"""
+import argparse
+import time
+import numpy as np
+import dlib
+from imutils import face_utils
+from ear import EyeBuffer, eye_aspect_ratio
+
+
+def legacy_ear(landmarks):
+    """The original per-pair EAR (six np.linalg.norm calls)"""
+    def compute(ptA, ptB):
+        return np.linalg.norm(ptA - ptB)
+    left = compute(landmarks[37], landmarks[41]) + compute(landmarks[38], landmarks[40])
+    right = compute(landmarks[43], landmarks[47]) + compute(landmarks[44], landmarks[46])
+    down_left = compute(landmarks[36], landmarks[39])
+    down_right = compute(landmarks[42], landmarks[45])
+    return (left + right) / (2.0 * (down_left + down_right))
+
+
+def synthetic_shapes(count, rng):
+    shapes = []
+    for _ in range(count):
+        points = dlib.points()
+        for x, y in rng.integers(100, 400, size=(68, 2)):
+            points.append(dlib.point(int(x), int(y)))
+        shapes.append(dlib.full_object_detection(dlib.rectangle(100, 100, 400, 400), points))
+    return shapes
+
+
+def per_frame_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return 1e6 * (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--faces", type=int, default=1, help="faces per frame")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shapes = synthetic_shapes(args.faces, rng)
+    eye_buffer = EyeBuffer(args.faces)
+
+    # Both paths must agree before their timings mean anything
+    before = [legacy_ear(face_utils.shape_to_np(s)) for s in shapes]
+    after = eye_buffer.ears(shapes)
+    assert np.allclose(before, after), "vectorized EAR disagrees with the original"
+
+    before_us = per_frame_us(lambda: [legacy_ear(face_utils.shape_to_np(s)) for s in shapes], args.iterations)
+    after_us = per_frame_us(lambda: eye_buffer.ears(shapes), args.iterations)
+    print(f"{args.faces} face(s) per frame, {args.iterations} frames")
+    print(f"  shape_to_np + scalar EAR : {before_us:8.1f} us/frame")
+    print(f"  eye points + batch EAR   : {after_us:8.1f} us/frame  ({before_us / after_us:.1f}x)")
+
+    # Offline replay: EAR over a large precomputed landmark batch in one call
+    batch = rng.uniform(100, 400, size=(100000, 68, 2))
+    start = time.perf_counter()
+    eye_aspect_ratio(batch)
+    batch_us = 1e6 * (time.perf_counter() - start) / len(batch)
+    print(f"  (N, 68, 2) batch EAR     : {batch_us:8.3f} us/face over {len(batch)} faces")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""68-point vs eye-only landmark model: load time, memory, per-face cost and EAR agreement.
+
+Faces are detected once per frame at full resolution; both predictors
+then run on the same face rectangles and their EARs are compared.
+
+Usage (from the project root):
+    python -m benchmarks.landmarks clip.mp4
+    python -m benchmarks.landmarks 0 --frames 300 --eyes shape_predictor_eyes.dat
+"""
+import os
+import time
+import argparse
+import numpy as np
+import dlib
+from ear import get_ear, shape_to_eye_points
+from benchmarks.detect_scale import load_frames, largest
+
+SHAPE_PREDICTOR_PATH = "./shape_predictor_68_face_landmarks.dat"
+EYE_PREDICTOR_PATH = "./shape_predictor_eyes.dat"
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where it cannot be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def load(path):
+    """(predictor, load seconds, resident bytes added)"""
+    before = rss_bytes()
+    start = time.perf_counter()
+    predictor = dlib.shape_predictor(path)
+    seconds = time.perf_counter() - start
+    after = rss_bytes()
+    return predictor, seconds, (after - before) if before is not None and after is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="video file or camera index")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--full", default=SHAPE_PREDICTOR_PATH, help="68-point model")
+    parser.add_argument("--eyes", default=EYE_PREDICTOR_PATH, help="eye-only model (train_eye_predictor.py)")
+    args = parser.parse_args()
+
+    for path in (args.full, args.eyes):
+        if not os.path.exists(path):
+            raise SystemExit(f"Model '{path}' not found")
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        raise SystemExit(f"No frames read from {args.source}")
+
+    detector = dlib.get_frontal_face_detector()
+    faces = [largest(list(detector(gray))) for gray in frames]
+    samples = [(gray, face) for gray, face in zip(frames, faces) if face is not None]
+    if not samples:
+        raise SystemExit("No faces found")
+
+    # Eye-only first, so the 68-point model's larger allocation does not hide its growth
+    models = {}
+    for name, path in (("eyes", args.eyes), ("68", args.full)):
+        predictor, seconds, resident = load(path)
+        times, ears = [], []
+        for gray, face in samples:
+            start = time.perf_counter()
+            shape = predictor(gray, face)
+            times.append(time.perf_counter() - start)
+            ears.append(get_ear(shape_to_eye_points(shape)))
+        models[name] = {"path": path, "load": seconds, "resident": resident,
+                        "ms": 1000 * float(np.mean(times)), "ears": np.array(ears)}
+
+    print(f"{len(frames)} frames, {len(samples)} with a face")
+    print(f"{'model':>6} {'file MB':>8} {'RSS MB':>7} {'load s':>7} {'ms/face':>8} {'speedup':>8}")
+    for name in ("68", "eyes"):
+        m = models[name]
+        resident = f"{m['resident'] / 1e6:7.1f}" if m["resident"] is not None else f"{'n/a':>7}"
+        print(f"{name:>6} {os.path.getsize(m['path']) / 1e6:8.1f} {resident} {m['load']:7.2f} "
+              f"{m['ms']:8.3f} {models['68']['ms'] / m['ms']:7.2f}x")
+
+    error = np.abs(models["eyes"]["ears"] - models["68"]["ears"])
+    correlation = np.corrcoef(models["eyes"]["ears"], models["68"]["ears"])[0, 1] if len(error) > 1 else np.nan
+    print(f"EAR agreement: mean |dEAR| {error.mean():.4f}, p95 {np.percentile(error, 95):.4f}, "
+          f"max {error.max():.4f}, correlation {correlation:.3f}")
+
+
+if __name__ == "__main__":
+    main()
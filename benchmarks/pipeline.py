@@ -0,0 +1,70 @@
+"""Headless throughput benchmark of the detection engine.
+
+Replays recorded clips (or synthetic noise clips when none are given)
+through the engine with no camera and no display, and reports frames/sec,
+p50/p99 per-frame latency and the per-stage breakdown (detect, predict,
+EAR, state machine).
+
+Usage (from the project root):
+    python -m benchmarks.pipeline clip1.mp4 frames_dir/
+    python -m benchmarks.pipeline --synthetic 300 --resolution 640x480
+"""
+import argparse
+import time
+import numpy as np
+from driver2 import load_driver_config, CONFIG_FILE
+from replay import make_engine, replay
+
+STAGES = ("detect", "predict", "ear", "state")
+DEFAULT_THRESHOLDS = {"awake_ear": 0.30, "drowsy_ear": 0.22, "sleep_ear": 0.12}
+
+
+def synthetic_clip(frames, width, height, fps=30.0, seed=0):
+    """Noise frames: exercise detector cost and loop overhead without any recording"""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    for index in range(frames):
+        yield index, index / fps, np.roll(base, index, axis=1)
+
+
+def report(name, timings, elapsed):
+    totals = np.array([t["total"] for t in timings]) * 1000
+    print(f"{name}: {len(timings)} frames, {len(timings) / elapsed:.1f} FPS, "
+          f"p50 {np.percentile(totals, 50):.2f} ms, p99 {np.percentile(totals, 99):.2f} ms")
+    mean_total = totals.mean()
+    for stage in STAGES:
+        stage_ms = 1000 * np.mean([t.get(stage, 0.0) for t in timings])
+        share = 100 * stage_ms / mean_total if mean_total else 0.0
+        print(f"  {stage:<8} {stage_ms:8.3f} ms  ({share:4.1f}%)")
+
+
+def run(name, source, config):
+    engine = make_engine(DEFAULT_THRESHOLDS, config)
+    start = time.perf_counter()
+    timings = replay(engine, source)
+    elapsed = time.perf_counter() - start
+    if not timings:
+        print(f"{name}: no frames")
+        return
+    report(name, timings, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("clips", nargs="*", help="video files or frame directories")
+    parser.add_argument("--synthetic", type=int, default=300, help="synthetic frames when no clip is given")
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--config", default=CONFIG_FILE, help="driver config with detection settings")
+    args = parser.parse_args()
+
+    config = load_driver_config(args.config)
+    if args.clips:
+        for clip in args.clips:
+            run(clip, clip, config)
+    else:
+        width, height = (int(v) for v in args.resolution.split("x"))
+        run(f"synthetic {width}x{height}", synthetic_clip(args.synthetic, width, height), config)
+
+
+if __name__ == "__main__":
+    main()
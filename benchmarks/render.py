@@ -0,0 +1,91 @@
+"""Per-frame display cost: the old copy-and-blend path vs reused buffers and ROI blending.
+
+Uses synthetic frames, so no camera, clip or predictor file is needed.
+
+Usage (from the project root):
+    python -m benchmarks.render --resolution 1280x720 --iterations 2000
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from overlay import FrameBuffers, draw_status_overlay
+
+STATUS, COLOR = "Drowsy !", (0, 255, 255)
+EARS = [(0.2412, 0.2377)]
+STATS = ["FPS: 29.8", "capture 2.1 ms", "inference 21.4 ms", "render 1.2 ms"]
+
+
+def legacy_frame(frame):
+    """The original path: flipped copy, grayscale copy, full-frame overlay copy and blend"""
+    frame = cv2.flip(frame, 1)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    height, width = frame.shape[:2]
+    y_position = 50
+    cv2.putText(frame, STATS[0], (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    for i, line in enumerate(reversed(STATS[1:])):
+        cv2.putText(frame, line, (10, height - 10 - 20 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    status_size = cv2.getTextSize(STATUS, cv2.FONT_HERSHEY_SIMPLEX, 1.2, 3)[0]
+    status_x = (width - status_size[0]) // 2
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (status_x - 10, y_position - 40), (status_x + status_size[0] + 10, y_position + 10),
+                  (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+    cv2.putText(frame, STATUS, (status_x, y_position), cv2.FONT_HERSHEY_SIMPLEX, 1.2, COLOR, 3)
+    for smoothed_ear, ear in EARS:
+        y_position += 40
+        ear_text = f"EAR: {smoothed_ear:.2f} (Raw: {ear:.2f})"
+        ear_size = cv2.getTextSize(ear_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+        ear_x = (width - ear_size[0]) // 2
+        cv2.rectangle(frame, (ear_x - 5, y_position - 25), (ear_x + ear_size[0] + 5, y_position + 5), (0, 0, 0), -1)
+        cv2.putText(frame, ear_text, (ear_x, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return gray, frame
+
+
+def buffered_frame(frame, analysis, display):
+    """The current path: grayscale and mirror into reused buffers, blend only the status box"""
+    gray = analysis.gray(frame)
+    shown = display.mirror(frame)
+    draw_status_overlay(shown, STATUS, COLOR, EARS, STATS)
+    return gray, shown
+
+
+def headless_frame(frame, analysis):
+    return analysis.gray(frame), None
+
+
+def per_frame_us(fn, frames, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(frames[i % len(frames)])
+    return 1e6 * (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8) for _ in range(8)]
+    analysis, display = FrameBuffers(), FrameBuffers()
+
+    # Both paths must produce the same pixels before their timings mean anything
+    old_gray, old_shown = legacy_frame(frames[0])
+    new_gray, new_shown = buffered_frame(frames[0], analysis, display)
+    assert np.array_equal(old_shown, new_shown), "buffered overlay differs from the original"
+    assert np.array_equal(old_gray, cv2.flip(new_gray, 1)), "grayscale differs from the original"
+
+    legacy_us = per_frame_us(legacy_frame, frames, args.iterations)
+    buffered_us = per_frame_us(lambda f: buffered_frame(f, analysis, display), frames, args.iterations)
+    headless_us = per_frame_us(lambda f: headless_frame(f, analysis), frames, args.iterations)
+    print(f"{width}x{height}, {args.iterations} frames")
+    print(f"  copies + full-frame blend : {legacy_us:8.1f} us/frame")
+    print(f"  reused buffers + ROI blend: {buffered_us:8.1f} us/frame  ({legacy_us / buffered_us:.1f}x)")
+    print(f"  headless (grayscale only) : {headless_us:8.1f} us/frame  ({legacy_us / headless_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Driver state machine: per-sample updates vs one vectorized pass over an EAR trace.
+
+Uses a synthetic trace (awake stretches with drowsy and sleeping episodes
+and the odd no-face gap), so no camera or clip is needed.
+
+Usage (from the project root):
+    python -m benchmarks.state_machine --hours 4 --fps 30
+"""
+import argparse
+import time
+import numpy as np
+from state_machine import DriverState, STATUSES
+
+AWAKE_EAR, SLEEP_EAR = 0.30, 0.10
+
+
+def synthetic_trace(samples, fps, rng):
+    """(timestamps, ears): episodes of 1-60 s at awake / drowsy / sleeping EAR levels plus noise"""
+    levels = []
+    total = 0
+    while total < samples:
+        length = int(rng.uniform(1, 60) * fps)
+        level = rng.choice([0.32, 0.20, 0.08, np.nan], p=[0.6, 0.2, 0.15, 0.05])
+        levels.append(np.full(length, level))
+        total += length
+    ears = np.concatenate(levels)[:samples] + rng.normal(0, 0.01, samples)
+    return np.arange(samples) / fps, ears
+
+
+def run_scalar(machine, timestamps, ears):
+    codes = np.empty(len(ears), dtype=np.int8)
+    events = []
+    for i, (timestamp, ear) in enumerate(zip(timestamps.tolist(), ears.tolist())):
+        for event in machine.update(timestamp, ear):
+            events.append(event._replace(index=i))
+        codes[i] = STATUSES.index(machine.status) if machine.status else -1
+    return codes, events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=4)
+    parser.add_argument("--fps", type=float, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    samples = int(args.hours * 3600 * args.fps)
+    timestamps, ears = synthetic_trace(samples, args.fps, rng)
+
+    start = time.perf_counter()
+    scalar_codes, scalar_events = run_scalar(DriverState(AWAKE_EAR, SLEEP_EAR), timestamps, ears)
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    codes, events = DriverState(AWAKE_EAR, SLEEP_EAR).run(timestamps, ears)
+    vector_s = time.perf_counter() - start
+
+    # Both paths must agree before their timings mean anything
+    assert np.array_equal(scalar_codes, codes), "vectorized statuses disagree with per-sample updates"
+    assert [(e.kind, e.status, e.index) for e in scalar_events] == [(e.kind, e.status, e.index) for e in events], \
+        "vectorized events disagree with per-sample updates"
+
+    alerts = sum(1 for e in events if e.kind == "alert")
+    print(f"{args.hours:g} h at {args.fps:g} FPS: {samples} samples, {len(events)} events ({alerts} alerts)")
+    print(f"  per-sample update : {scalar_s:8.3f} s  ({1e6 * scalar_s / samples:.2f} us/sample)")
+    print(f"  vectorized run    : {vector_s:8.3f} s  ({scalar_s / vector_s:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import json
+import datetime
+import threading
+import numpy as np
+from smoothing import RingBuffer
+
+# Profiles live next to driver_config.json, one file per driver id
+PROFILE_DIR_NAME = "calibration_profiles"
+
+
+def profile_path(driver_id, config_file="driver_config.json"):
+    base_dir = os.path.dirname(os.path.abspath(config_file))
+    safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(driver_id))
+    return os.path.join(base_dir, PROFILE_DIR_NAME, f"{safe_id}.json")
+
+
+def save_profile(driver_id, profile, config_file="driver_config.json"):
+    """Write a calibration profile atomically (stamping it with ids and times)"""
+    path = profile_path(driver_id, config_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    profile["driver_id"] = driver_id
+    profile["updated_at"] = datetime.datetime.now().isoformat()
+    profile.setdefault("created_at", profile["updated_at"])
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"Error saving calibration profile: {e}")
+        return False
+
+
+def load_profile(driver_id, max_age_days=30, config_file="driver_config.json"):
+    """Load a driver's calibration profile; None if missing, unreadable or stale"""
+    path = profile_path(driver_id, config_file)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            profile = json.load(f)
+        for key in ("awake_ear", "drowsy_ear", "sleep_ear"):
+            float(profile[key])
+        # Staleness is judged on the last full calibration, not on online adjustments
+        calibrated_at = datetime.datetime.fromisoformat(profile.get("calibrated_at") or profile.get("created_at"))
+    except Exception as e:
+        print(f"Ignoring unreadable calibration profile {path}: {e}")
+        return None
+
+    age_days = (datetime.datetime.now() - calibrated_at).total_seconds() / 86400
+    if max_age_days is not None and age_days > max_age_days:
+        print(f"Calibration profile for {driver_id} is {age_days:.0f} days old, recalibrating")
+        return None
+    return profile
+
+
+def build_profile(awake_samples, drowsy_samples, sleep_samples, default=0.2):
+    """Profile dict from the raw EAR values of the three calibration phases"""
+    def mean(values):
+        return float(np.mean(values)) if len(values) else default
+
+    return {
+        "awake_ear": mean(awake_samples),
+        "drowsy_ear": mean(drowsy_samples),
+        "sleep_ear": mean(sleep_samples),
+        "calibrated_awake_ear": mean(awake_samples),
+        "calibrated_at": datetime.datetime.now().isoformat(),
+        "samples": {
+            "awake": [round(float(v), 4) for v in awake_samples],
+            "drowsy": [round(float(v), 4) for v in drowsy_samples],
+            "sleep": [round(float(v), 4) for v in sleep_samples],
+        },
+    }
+
+
+class OnlineRecalibrator:
+    """Slowly re-centres awake_ear on the EAR the driver shows with eyes open.
+
+    The frame loop pushes every smoothed EAR sample; only samples above the
+    midpoint of the driver's calibrated awake and drowsy EAR are kept, a
+    floor fixed at calibration time so the threshold being adjusted never
+    decides which samples adjust it. A background thread periodically
+    blends the median of the samples collected since the last blend into
+    the profile, keeps it above the drowsy threshold, saves it and reports
+    the new value through `on_update(awake_ear)`.
+    """
+
+    def __init__(self, driver_id, profile, on_update=None, interval=60, window=1800,
+                 min_samples=300, weight=0.1, config_file="driver_config.json"):
+        self.driver_id = driver_id
+        self.profile = profile
+        self.on_update = on_update
+        self.interval = interval
+        self.min_samples = min_samples
+        self.weight = weight
+        self.config_file = config_file
+        self.samples = RingBuffer(window)
+        # The awake EAR of the last full calibration; online updates never move it
+        calibrated_awake = profile.setdefault("calibrated_awake_ear", profile["awake_ear"])
+        self.min_ear = (calibrated_awake + profile["drowsy_ear"]) / 2
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="recalibration", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def add_sample(self, ear):
+        if ear >= self.min_ear:
+            self.samples.push(ear)
+
+    def recalibrate(self):
+        """Blend the eyes-open EAR seen since the last blend into the profile; returns the new awake_ear or None"""
+        if self.samples.count < self.min_samples:
+            return None
+        observed = float(np.median(self.samples.values()))
+        # Each blend uses fresh samples only, so old ones are not counted again next interval
+        self.samples.clear()
+        awake = (1 - self.weight) * self.profile["awake_ear"] + self.weight * observed
+        # Never let the awake threshold sink into the drowsy band
+        awake = max(awake, self.profile["drowsy_ear"] * 1.05)
+        self.profile["awake_ear"] = awake
+        self.profile["online_updates"] = self.profile.get("online_updates", 0) + 1
+        save_profile(self.driver_id, self.profile, self.config_file)
+        if self.on_update:
+            self.on_update(awake)
+        return awake
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.recalibrate()
+            except Exception as e:
+                print(f"Error during online recalibration: {e}")
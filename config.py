@@ -0,0 +1,24 @@
+import os
+import json
+
+# Driver configuration file path
+CONFIG_FILE = "driver_config.json"
+
+
+# Load driver information from config file if available. Kept free of OpenCV / dlib imports so the
+# fleet supervisor can read worker configs without loading them.
+def load_driver_config(config_file=CONFIG_FILE):
+    if os.path.exists(config_file):
+        try:
+            with open(config_file, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading driver configuration: {e}")
+
+    # Default driver information if config file not available
+    return {
+        "name": "John Doe",
+        "id": "DRV12345",
+        "vehicle": "TN-01-AB-1234",
+        "phone": "+1-555-123-4567"
+    }
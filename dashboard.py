@@ -1,18 +1,62 @@
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO
-import json
 import os
-import datetime
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Async worker model: eventlet / gevent (production) or threading (development).
+# Monkey patching has to happen before anything else imports socket or threading.
+ASYNC_MODE = os.getenv('DASHBOARD_ASYNC_MODE', 'auto')
+if ASYNC_MODE == 'auto':
+    import importlib.util
+    ASYNC_MODE = next((m for m in ('eventlet', 'gevent') if importlib.util.find_spec(m)), 'threading')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, render_template, request, jsonify, Response
+from flask_socketio import SocketIO, join_room, leave_room, rooms, emit
+import json
+import math
+import time
+import gzip
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from alert_store import open_store
+from telemetry import decode_fixes
+from backpressure import ClientSendBuffers
+from path_store import PathStore, SIMPLIFIERS, encode_polyline
+from subscriptions import FLEET_ROOM, PositionIndex, event_rooms, filter_rooms, parse_bbox, subscription_rooms
+from outbox import IngestLog
+from metrics import CONTENT_TYPE, counter, histogram, gauge, render, profile_for, profile_seconds
+
+# Message queue (e.g. redis://localhost:6379/0) lets several dashboard workers share clients and rooms
+MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+DEBUG = os.getenv('DASHBOARD_DEBUG', '').lower() in ('1', 'true', 'yes')
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'drowsiness_detection_secret')
-socketio = SocketIO(app)
+socketio = SocketIO(app, async_mode=ASYNC_MODE, message_queue=MESSAGE_QUEUE)
+
+# Slow browsers get a bounded, drop-oldest buffer instead of an unbounded transport queue
+send_buffers = ClientSendBuffers(
+    socketio.server.eio,
+    max_pending=int(os.getenv('CLIENT_MAX_PENDING', '32')),
+    max_buffered=int(os.getenv('CLIENT_MAX_BUFFERED', '64'))
+).install()
 
-ALERTS_FILE = "driver_alerts.json"
+alert_store = open_store()
+path_store = PathStore()
+# Last applied outbox sequence per device, next to the alerts it covers; /ingest uploads are
+# serialized so a retry cannot race its original
+ingest_log = IngestLog(alert_store)
+ingest_lock = threading.Lock()
+PATH_RETENTION_DAYS = float(os.getenv('PATH_RETENTION_DAYS', '30'))
 MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
 
 # Track current driver status
@@ -22,66 +66,526 @@ current_driver_status = {
     "last_update": None
 }
 
-def get_alerts():
-    """Load alerts from JSON file"""
-    if os.path.exists(ALERTS_FILE):
-        with open(ALERTS_FILE, "r") as f:
-            try:
-                return json.load(f)
-            except:
-                return []
-    return []
+# Request latency, Socket.IO fan-out time and backlog gauges, served on /metrics
+REQUEST_SECONDS = histogram("dashboard_request_seconds", "HTTP request latency",
+                            ["endpoint", "method", "status"])
+EMIT_SECONDS = histogram("dashboard_emit_seconds", "Time to fan one event out to its rooms", ["event"])
+SEND_BUFFERED = gauge("dashboard_send_buffered", "Packets held back for slow clients", ["kind"])
+SEND_BUFFERED.labels("clients").set_function(lambda: send_buffers.stats()["buffering_clients"])
+SEND_BUFFERED.labels("packets").set_function(lambda: send_buffers.stats()["buffered"])
+SEND_BUFFERED.labels("dropped").set_function(lambda: send_buffers.stats()["dropped"])
+INGESTED = counter("dashboard_ingested_items", "Outbox items received through /ingest", ["result"])
+METRICS_PROFILING = os.getenv('METRICS_PROFILING', '').lower() in ('1', 'true', 'yes')
+
+# Location updates are coalesced and broadcast once per tick instead of once per fix
+LOCATION_TICK = float(os.getenv('LOCATION_TICK', '1.0'))
+pending_locations = {}
+pending_lock = threading.Lock()
+background_started = False
+# Latest position per driver, for viewport snapshots when a client subscribes
+vehicle_positions = PositionIndex()
+gauge("dashboard_pending_locations", "Drivers waiting for the next location tick").set_function(
+    lambda: len(pending_locations))
+
+def start_background_tasks():
+    """Start the per-worker location tick and send-buffer flusher (once)"""
+    global background_started
+    with pending_lock:
+        if background_started:
+            return
+        background_started = True
+    socketio.start_background_task(flush_locations)
+    socketio.start_background_task(flush_send_buffers)
+    socketio.start_background_task(prune_paths)
+
+def prune_paths():
+    """Background task: drop stored path points past the retention period, hourly"""
+    while True:
+        try:
+            path_store.prune(time.time() - PATH_RETENTION_DAYS * 86400)
+        except Exception as e:
+            print(f"Error pruning paths: {e}")
+        socketio.sleep(3600)
+
+def flush_send_buffers():
+    """Background task: move buffered packets on to clients that have caught up"""
+    while True:
+        socketio.sleep(0.1)
+        send_buffers.flush()
+
+def queue_location(driver_id, location, path):
+    """Record the latest location (and new path points) for the next tick"""
+    start_background_tasks()
+    with pending_lock:
+        entry = pending_locations.setdefault(driver_id, {"path": []})
+        entry["location"] = location
+        entry["path"].extend(path)
+    vehicle_positions.update(driver_id, location["latitude"], location["longitude"],
+                             {"location": location, "path": [[location["latitude"], location["longitude"]]]})
+
+def flush_locations():
+    """Background task: coalesced 'location_batch' emits, once per tick"""
+    while True:
+        socketio.sleep(LOCATION_TICK)
+        with pending_lock:
+            if not pending_locations:
+                continue
+            drivers = dict(pending_locations)
+            pending_locations.clear()
+        meta = {
+            "status": current_driver_status["status"],
+            "timestamp": current_driver_status["last_update"]
+        }
+        with EMIT_SECONDS.labels('location_batch').time():
+            # Whole-fleet watchers get every driver that moved in one message
+            socketio.emit('location_batch', dict(meta, drivers=drivers), to=FLEET_ROOM)
+            # Filtered watchers get only the drivers they subscribed to (by id, vehicle or map cell)
+            for driver_id, update in drivers.items():
+                location = update["location"]
+                targets = filter_rooms(driver_id, location.get("vehicle"), location["latitude"], location["longitude"])
+                socketio.emit('location_batch', dict(meta, drivers={driver_id: update}), to=targets)
+
+# Alert history API: cursor-paginated pages, cached in memory per query
+ALERT_PAGE_SIZE = 20
+MAX_ALERT_PAGE_SIZE = 200
+ALERT_CACHE_SIZE = 256
+alert_page_cache = OrderedDict()
+alert_cache_lock = threading.Lock()
+
+def invalidate_alert_cache():
+    """Drop cached alert pages (called whenever a new alert arrives)"""
+    with alert_cache_lock:
+        alert_page_cache.clear()
+
+def get_alert_page(limit, before_id, filters):
+    """Return (body, etag) for one page of alerts, newest first"""
+    # Pages below a cursor never change (the store is append-only). The newest page is
+    # tied to the store's last id, so alerts written by other processes still show up.
+    version = alert_store.last_id() if before_id is None else None
+    key = (limit, before_id, tuple(sorted(filters.items())))
+    with alert_cache_lock:
+        cached = alert_page_cache.get(key)
+        if cached is not None and cached[0] == version:
+            alert_page_cache.move_to_end(key)
+            return cached[1], cached[2]
+
+    # One extra row tells us whether an older page exists
+    alerts = alert_store.list_alerts(limit=limit + 1, before_id=before_id, **filters)
+    has_more = len(alerts) > limit
+    alerts = alerts[:limit]
+    body = json.dumps({
+        "alerts": alerts,
+        "next_before_id": alerts[-1]["id"] if has_more else None
+    })
+    etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+    with alert_cache_lock:
+        alert_page_cache[key] = (version, body, etag)
+        alert_page_cache.move_to_end(key)
+        while len(alert_page_cache) > ALERT_CACHE_SIZE:
+            alert_page_cache.popitem(last=False)
+    return body, etag
+
+@socketio.on('connect')
+def on_connect():
+    start_background_tasks()
+    # Until a client subscribes to something narrower it watches the whole fleet
+    join_room(FLEET_ROOM)
+
+@socketio.on('subscribe')
+def on_subscribe(data):
+    """Replace this client's subscription: {"drivers": [...], "vehicles": [...], "bbox": [s, w, n, e]}"""
+    try:
+        new_rooms = subscription_rooms(data)
+        bbox = parse_bbox(data["bbox"]) if data and data.get("bbox") is not None else None
+    except (ValueError, TypeError, AttributeError) as e:
+        return {"status": "error", "message": str(e)}
+    
+    for room in rooms():
+        if room != request.sid and room not in new_rooms:
+            leave_room(room)
+    for room in new_rooms:
+        join_room(room)
+    
+    # Vehicles already inside the viewport, so the map is not empty until they next move
+    visible = vehicle_positions.within(bbox) if bbox is not None else None
+    if visible:
+        emit('location_batch', {
+            "drivers": visible,
+            "status": current_driver_status["status"],
+            "timestamp": current_driver_status["last_update"]
+        })
+    return {"status": "success", "rooms": len(new_rooms)}
 
 @app.route('/')
 def index():
     """Main dashboard page"""
+    try:
+        alert_counts = {status: count for status, (count, _) in alert_store.rollups("status").items()}
+    except Exception as e:
+        print(f"Error counting alerts: {e}")
+        alert_counts = {}
+    # Alerts themselves are fetched page by page from /api/alerts
     return render_template('index.html', 
-                         alerts=get_alerts(), 
+                         alert_counts=alert_counts,
+                         page_size=ALERT_PAGE_SIZE,
                          current_status=current_driver_status,
                          maps_api_key=MAPS_API_KEY)
 
-@app.route('/alert', methods=['POST'])
-def receive_alert():
-    """Endpoint to receive alerts from the drowsiness detection system"""
-    alert_data = request.json
+@app.route('/api/alerts')
+def api_alerts():
+    """Alert history, newest first: ?limit=&before_id=&driver=&status=&since=&until="""
+    try:
+        limit = min(max(int(request.args.get('limit', ALERT_PAGE_SIZE)), 1), MAX_ALERT_PAGE_SIZE)
+        before_id = request.args.get('before_id')
+        before_id = int(before_id) if before_id else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and before_id must be integers"}), 400
+    
+    filters = {}
+    for arg, name in (('driver', 'driver_id'), ('status', 'status'), ('since', 'since'), ('until', 'until')):
+        if request.args.get(arg):
+            filters[name] = request.args[arg]
+    
+    try:
+        body, etag = get_alert_page(limit, before_id, filters)
+    except Exception as e:
+        print(f"Error loading alerts: {e}")
+        return jsonify({"status": "error", "message": "Could not load alerts"}), 500
+    
+    return conditional_json(body, etag)
+
+@app.route('/api/stats')
+def api_stats():
+    """Fleet summary from the precomputed rollups: ?hours=24&days=30"""
+    try:
+        hours = min(max(int(request.args.get('hours', 24)), 1), 24 * 31)
+        days = min(max(int(request.args.get('days', 30)), 1), 3660)
+    except ValueError:
+        return jsonify({"status": "error", "message": "hours and days must be integers"}), 400
+    
+    try:
+        body = json.dumps(alert_store.stats(hours, days))
+    except Exception as e:
+        print(f"Error loading stats: {e}")
+        return jsonify({"status": "error", "message": "Could not load stats"}), 500
+    return conditional_json(body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+
+@app.route('/api/path/<driver_id>')
+def api_path(driver_id):
+    """A driver's stored track: ?zoom=&hours=12&since=&until=&algorithm=dp|vw&format=json|polyline"""
+    try:
+        zoom = request.args.get('zoom')
+        zoom = min(max(float(zoom), 0), 22) if zoom else None
+        until = float(request.args['until']) if request.args.get('until') else None
+        if request.args.get('since'):
+            since = float(request.args['since'])
+        else:
+            since = (until or time.time()) - float(request.args.get('hours', 12)) * 3600
+    except ValueError:
+        return jsonify({"status": "error", "message": "zoom, hours, since and until must be numbers"}), 400
+    algorithm = request.args.get('algorithm', 'dp')
+    output = request.args.get('format', 'json')
+    if algorithm not in SIMPLIFIERS or output not in ('json', 'polyline'):
+        return jsonify({"status": "error", "message": "algorithm must be dp or vw, format json or polyline"}), 400
+    
+    try:
+        track, raw_count = path_store.simplified(driver_id, zoom, since, until, algorithm)
+    except Exception as e:
+        print(f"Error loading path: {e}")
+        return jsonify({"status": "error", "message": "Could not load path"}), 500
+    
+    result = {
+        "driver_id": driver_id,
+        "raw_points": raw_count,
+        "points": len(track),
+        "start": float(track[0, 0]) if len(track) else None,
+        "end": float(track[-1, 0]) if len(track) else None
+    }
+    if output == 'polyline':
+        result["polyline"] = encode_polyline(track[:, 1:].tolist())
+    else:
+        result["path"] = [[round(lat, 6), round(lon, 6)] for lat, lon in track[:, 1:].tolist()]
+    body = json.dumps(result)
+    return conditional_json(body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+
+def conditional_json(body, etag):
+    """JSON response that answers If-None-Match with an empty 304 when nothing changed"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.before_request
+def start_request_timer():
+    request.started_at = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started_at = getattr(request, 'started_at', None)
+    if started_at is not None:
+        # Label by route rule, not raw path, so /api/path/<driver_id> stays one series
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(
+            time.perf_counter() - started_at)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(render(), content_type=CONTENT_TYPE)
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sample every thread for ?seconds= and return folded stacks (METRICS_PROFILING=1 only)"""
+    if not METRICS_PROFILING:
+        return jsonify({"status": "error", "message": "Profiling is disabled"}), 404
+    try:
+        seconds = profile_seconds(request.args.get('seconds', 10))
+    except ValueError:
+        return jsonify({"status": "error", "message": "seconds must be a non-negative number"}), 400
+    return Response(profile_for(seconds), mimetype='text/plain')
+
+def read_json_body():
+    """Request body as JSON, gunzipped when sent with Content-Encoding: gzip"""
+    body = request.get_data()
+    if request.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+def validate_alert(alert_data):
+    """(response body, HTTP status) describing what is wrong with an alert, or None if it can be stored"""
     if not alert_data:
-        return jsonify({"status": "error", "message": "No JSON body provided"}), 400
+        return {"status": "error", "message": "No JSON body provided"}, 400
+    if not isinstance(alert_data, dict):
+        return {"status": "error", "message": "Alert must be an object"}, 400
     
     required_fields = ["status", "driver", "location"]
     missing = [f for f in required_fields if f not in alert_data]
     if missing:
-        return jsonify({"status": "error", "message": f"Missing fields: {', '.join(missing)}"}), 400
+        return {"status": "error", "message": f"Missing fields: {', '.join(missing)}"}, 400
+    
+    # The store indexes and rolls up timestamp / status / duration; room lookup reads driver and location
+    if not isinstance(alert_data["status"], str):
+        return {"status": "error", "message": "status must be a string"}, 400
+    if not isinstance(alert_data.get("timestamp", ""), str):
+        return {"status": "error", "message": "timestamp must be a string"}, 400
+    duration = alert_data.get("duration")
+    if duration is not None and (isinstance(duration, bool) or not isinstance(duration, (int, float))):
+        return {"status": "error", "message": "duration must be a number or null"}, 400
+    if not isinstance(alert_data["driver"], dict):
+        return {"status": "error", "message": "driver must be an object"}, 400
+    if alert_data["location"] is not None and not isinstance(alert_data["location"], dict):
+        return {"status": "error", "message": "location must be an object or null"}, 400
+    return None
+
+def apply_alert(alert_data, received=None):
+    """Validate and broadcast one alert; returns (response body, HTTP status).
+    
+    Callers that store alerts do so after validate_alert() and before this,
+    so nothing is broadcast for an alert the history does not have.
+    """
+    error = validate_alert(alert_data)
+    if error is not None:
+        return error
     
     current_driver_status["status"] = alert_data.get("status", "Unknown")
+    invalidate_alert_cache()
     
-    # Broadcast new alert to all connected clients
-    socketio.emit('new_alert', alert_data)
+    # Send the alert to the whole-fleet room and to clients watching this driver, vehicle or area;
+    # alerts without a usable position (location null, e.g. from fleet workers) skip the area rooms
+    driver = alert_data["driver"]
+    location = alert_data["location"] or {}
+    latitude, longitude = location.get("latitude"), location.get("longitude")
+    if not (isinstance(latitude, (int, float)) and isinstance(longitude, (int, float))):
+        latitude = longitude = None
+    with EMIT_SECONDS.labels('new_alert').time():
+        socketio.emit('new_alert', alert_data, to=event_rooms(driver.get("id"), driver.get("vehicle"), latitude, longitude))
     
-    return jsonify({"status": "success"})
+    return {"status": "success"}, 200
 
-@app.route('/location_update', methods=['POST'])
-def location_update():
-    """Endpoint to receive continuous location updates"""
-    data = request.json
+def apply_location_update(data, received=None):
+    """Store and queue one location fix; `received` is when the device produced it (defaults to now)"""
     if not data:
-        return jsonify({"status": "error", "message": "No JSON body provided"}), 400
+        return {"status": "error", "message": "No JSON body provided"}, 400
     
     required_fields = ["latitude", "longitude"]
     missing = [f for f in required_fields if f not in data]
     if missing:
-        return jsonify({"status": "error", "message": f"Missing fields: {', '.join(missing)}"}), 400
+        return {"status": "error", "message": f"Missing fields: {', '.join(missing)}"}, 400
+    
+    # Convert once; everything downstream (path store, cell index, broadcast) gets plain floats
+    try:
+        latitude, longitude = float(data["latitude"]), float(data["longitude"])
+    except (TypeError, ValueError):
+        return {"status": "error", "message": "latitude and longitude must be numbers"}, 400
+    if not (math.isfinite(latitude) and math.isfinite(longitude)
+            and -90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return {"status": "error", "message": "latitude or longitude out of range"}, 400
+    data = dict(data, latitude=latitude, longitude=longitude)
     
     current_driver_status["location"] = data
     current_driver_status["last_update"] = datetime.datetime.now().isoformat()
     
-    # Broadcast location update to all connected clients
-    socketio.emit('location_update', {
-        "location": data,
-        "status": current_driver_status["status"],
-        "timestamp": current_driver_status["last_update"]
-    })
+    try:
+        path_store.append(data.get("driver_id"), [(received or time.time(), latitude, longitude)])
+    except Exception as e:
+        print(f"Error storing path point: {e}")
+    
+    # Broadcast with the next coalesced tick
+    queue_location(data.get("driver_id"), data, [[latitude, longitude]])
+    
+    return {"status": "success"}, 200
+
+def apply_location_batch(batch, received=None):
+    """Store and queue a delta-encoded batch of fixes (the fixes carry their own timestamps)"""
+    try:
+        fixes = decode_fixes(batch)
+    except ValueError as e:
+        return {"status": "error", "message": f"Invalid batch: {e}"}, 400
+    
+    _, latitude, longitude = fixes[-1]
+    location = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "address": batch.get("address") or f"Location at {latitude}, {longitude}",
+        "driver_id": batch.get("driver_id"),
+        "vehicle": batch.get("vehicle")
+    }
+    current_driver_status["location"] = location
+    current_driver_status["last_update"] = datetime.datetime.now().isoformat()
+    
+    try:
+        path_store.append(batch.get("driver_id"), fixes)
+    except Exception as e:
+        print(f"Error storing path points: {e}")
+    
+    queue_location(batch.get("driver_id"), location, [[lat, lon] for _, lat, lon in fixes])
+    
+    return {"status": "success", "accepted": len(fixes)}, 200
+
+# Paths a device outbox may bundle into one /ingest upload
+INGEST_HANDLERS = {
+    "/alert": apply_alert,
+    "/location_update": apply_location_update,
+    "/location_batch": apply_location_batch
+}
+
+@app.route('/alert', methods=['POST'])
+def receive_alert():
+    """Endpoint to receive alerts from the drowsiness detection system.
+    
+    Alerts are stored, bumping the rollups in the same transaction, before
+    they are broadcast. Posts a device outbox sends one at a time carry
+    X-Outbox-Source / X-Outbox-Seq: re-sends are then skipped as on
+    /ingest, and devices registered as local sources (logging to this same
+    store themselves) are not stored twice.
+    """
+    alert_data = request.get_json(silent=True)
+    error = validate_alert(alert_data)
+    if error is not None:
+        return jsonify(error[0]), error[1]
+    
+    source = request.headers.get('X-Outbox-Source')
+    try:
+        seq = int(request.headers.get('X-Outbox-Seq', 0))
+    except ValueError:
+        seq = 0
+    try:
+        if source and seq > 0:
+            with ingest_lock:
+                if seq <= ingest_log.last_seq(source):
+                    return jsonify({"status": "success", "duplicate": True})
+                ingest_log.advance(source, seq, [(seq, alert_data)])
+        elif not (source and ingest_log.is_local(source)):
+            alert_store.append(alert_data)
+    except Exception as e:
+        print(f"Error storing alert: {e}")
+        return jsonify({"status": "error", "message": f"Error storing alert: {e}"}), 500
+    
+    body, status = apply_alert(alert_data)
+    return jsonify(body), status
+
+@app.route('/location_update', methods=['POST'])
+def location_update():
+    """Endpoint to receive continuous location updates"""
+    body, status = apply_location_update(request.json)
+    return jsonify(body), status
+
+@app.route('/location_batch', methods=['POST'])
+def location_batch():
+    """Endpoint to receive delta-encoded (optionally gzipped) batches of location fixes"""
+    try:
+        batch = read_json_body()
+    except (OSError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Invalid batch: {e}"}), 400
+    body, status = apply_location_batch(batch)
+    return jsonify(body), status
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Endpoint for bulk, in-order uploads from a device outbox.
+    
+    Items are applied once per (source, seq): anything at or below the
+    source's last acknowledged sequence is a re-send and is skipped, so a
+    device may retry an upload whose response it never saw. Applied alerts
+    are stored together with the new cursor, so the history and rollups
+    count each exactly once.
+    """
+    try:
+        upload = read_json_body()
+        source = str(upload["source"])
+        items = sorted(upload["items"], key=lambda item: int(item["seq"]))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return jsonify({"status": "error", "message": f"Invalid upload: {e}"}), 400
+    
+    applied = skipped = rejected = 0
+    failure = None
+    with ingest_lock:
+        last_seq = ingest_log.last_seq(source)
+        for item in items:
+            seq = int(item["seq"])
+            if seq <= last_seq:
+                skipped += 1
+                continue
+            handler = INGEST_HANDLERS.get(item.get("path"))
+            payload = item.get("payload")
+            if handler is apply_alert and validate_alert(payload) is None:
+                # Stored (with the cursor) before it is broadcast; a failed write stops the upload here
+                # so the device re-sends from this item instead of it being acked unstored
+                try:
+                    if ingest_log.advance(source, seq, [(seq, payload)]):
+                        invalidate_alert_cache()
+                except Exception as e:
+                    failure = f"Error storing alert #{seq} from {source}: {e}"
+                    break
+            if handler is None:
+                rejected += 1
+            else:
+                try:
+                    _, status = handler(payload, item.get("t"))
+                except Exception as e:
+                    print(f"Error ingesting {item.get('path')} #{seq} from {source}: {e}")
+                    status = 400
+                if status >= 400:
+                    rejected += 1
+                else:
+                    applied += 1
+            # Rejected items are acknowledged too; re-sending them would fail the same way
+            last_seq = seq
+        try:
+            ingest_log.advance(source, last_seq)
+        except Exception as e:
+            failure = failure or f"Error saving ingest cursor for {source}: {e}"
+    INGESTED.labels("applied").inc(applied)
+    INGESTED.labels("skipped").inc(skipped)
+    INGESTED.labels("rejected").inc(rejected)
+    if failure is not None:
+        print(failure)
+        return jsonify({"status": "error", "message": failure}), 500
     
-    return jsonify({"status": "success"})
+    return jsonify({"status": "success", "acked": last_seq, "applied": applied,
+                    "skipped": skipped, "rejected": rejected})
 
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
@@ -92,4 +596,10 @@ if __name__ == '__main__':
     if not os.path.exists('static'):
         os.makedirs('static')
     
-    socketio.run(app, debug=True)
\ No newline at end of file
+    host = os.getenv('DASHBOARD_HOST', '127.0.0.1')
+    port = int(os.getenv('DASHBOARD_PORT', '5000'))
+    async_mode = socketio.server.eio.async_mode
+    if async_mode == 'threading' and not DEBUG:
+        print("Running on the threaded development server; install eventlet or gevent for production use")
+    socketio.run(app, host=host, port=port, debug=DEBUG, use_reloader=DEBUG,
+                 allow_unsafe_werkzeug=async_mode == 'threading')
\ No newline at end of file
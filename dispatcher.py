@@ -0,0 +1,232 @@
+import gzip
+import json
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from outbox import Outbox, OUTBOX_DB_FILE
+
+DASHBOARD_URL = "http://localhost:5000"
+# Bulk uploads above this size are gzipped
+GZIP_MIN_BYTES = 4096
+# Seconds before probing /ingest again after falling back to one post per item
+BULK_RETRY_INTERVAL = 600
+# Consecutive 500s on the same oldest post before the batch is sent one post at a time, and then
+# before that single post is dead-lettered. Gateway errors (502-504) mean the dashboard is down and
+# are retried without limit.
+MAX_SERVER_ERRORS = 5
+
+
+class Dispatcher:
+    """Background sender for dashboard HTTP posts, backed by a durable outbox.
+
+    `submit` writes the post to the on-device outbox (SQLite) with the next
+    sequence number and wakes the worker. The worker uploads the oldest
+    pending posts in order as one `/ingest` request and deletes them once
+    the dashboard acknowledges their sequence; while the dashboard is
+    unreachable posts stay on disk and the worker backs off, so a reconnect
+    uploads the backlog in a few bulk requests.
+    """
+
+    def __init__(self, base_url=DASHBOARD_URL, outbox_file=OUTBOX_DB_FILE, batch_size=500,
+                 max_batch_bytes=1000000, max_rows=200000, timeout=5, backoff=0.5, max_backoff=60):
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff  # longest wait between probes of a dead dashboard
+
+        self.outbox = Outbox(outbox_file, max_rows)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._bulk = True  # cleared for a while if the dashboard predates /ingest
+        self._bulk_retry_at = 0
+        self._server_errors = (None, 0)  # (oldest seq in the failing upload, consecutive 500s)
+        self._solo_until = None  # send one post at a time up to this seq to find a post that breaks uploads
+        self._thread = threading.Thread(target=self._run, name="dashboard-dispatcher", daemon=True)
+
+        self.sent = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, path, payload, compress=False):
+        """Store a POST in the outbox and wake the worker.
+
+        With `compress` the post is sent gzip-encoded.
+        """
+        try:
+            self.outbox.append(path, payload, compress)
+        except Exception as e:
+            print(f"Error storing dashboard post: {e}")
+            return
+        self._wake.set()
+
+    def pending(self):
+        """Posts in the outbox not yet acknowledged by the dashboard"""
+        return self.outbox.count()
+
+    def dead_letters(self):
+        """Posts set aside after the dashboard kept failing on them (`python outbox.py --requeue` retries them)"""
+        return self.outbox.dead_count()
+
+    def stop(self, timeout=2):
+        """Stop the worker, giving pending posts up to `timeout` seconds to go out.
+
+        Anything still pending stays in the outbox for the next run.
+        """
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.outbox.close()
+        self.session.close()
+
+    def _run(self):
+        failures = 0
+        while True:
+            rows = self.outbox.peek(self.batch_size, self.max_batch_bytes)
+            if not rows or (failures and self._stopping.is_set()):
+                if self._stopping.is_set():
+                    return
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            if self._upload(rows):
+                if failures:
+                    print(f"Dashboard reachable again, {self.pending()} posts left in the outbox")
+                failures = 0
+                continue
+
+            failures += 1
+            if failures == 1:
+                print(f"Dashboard unreachable or refusing uploads, keeping posts in {self.outbox.path}")
+            self._stopping.wait(min(self.max_backoff, self.backoff * 2 ** (failures - 1)))
+
+    def _post(self, path, body, compress, seq=None):
+        """POST a JSON body (already serialized); returns the response or None if unreachable.
+
+        Single posts carry their outbox source and sequence so the dashboard can skip re-sends.
+        """
+        data = body.encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if seq is not None:
+            headers["X-Outbox-Source"] = self.outbox.source
+            headers["X-Outbox-Seq"] = str(seq)
+        if compress:
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
+        try:
+            return self.session.post(self.base_url + path, data=data, headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            return None
+
+    @staticmethod
+    def _rejected(resp):
+        """True for a 400 carrying the dashboard's own JSON error body: the posts are invalid, not undelivered"""
+        if resp.status_code != 400:
+            return False
+        try:
+            return resp.json().get("status") == "error"
+        except (ValueError, AttributeError):
+            return False
+
+    def _server_error(self, rows, resp):
+        """Count a 500 for this upload; isolate and finally dead-letter a post the dashboard cannot take.
+
+        Returns True when the failing post was set aside, so the queue moves on.
+        """
+        head = rows[0][0]
+        previous, count = self._server_errors
+        count = count + 1 if previous == head else 1
+        self._server_errors = (head, count)
+        if count < MAX_SERVER_ERRORS:
+            return False
+        if len(rows) > 1:
+            print(f"Dashboard keeps failing on posts {head}-{rows[-1][0]}, sending them one at a time")
+            self._solo_until = rows[-1][0]
+            self._server_errors = (None, 0)
+            return False
+        reason = f"{resp.status_code} {resp.text[:200]}"
+        print(f"Dashboard keeps failing on {rows[0][2]} #{head} ({reason}); moved to dead letters")
+        self.outbox.dead_letter(head, reason)
+        self._server_errors = (None, 0)
+        return True
+
+    def _upload(self, rows):
+        """Send `rows` in order and ack what the dashboard took; False if it should be retried later"""
+        if self._solo_until is not None:
+            if rows[0][0] > self._solo_until:
+                self._solo_until = None
+            else:
+                rows = rows[:1]
+        if not self._bulk:
+            if time.time() < self._bulk_retry_at:
+                return self._upload_each(rows)
+            self._bulk = True
+
+        # Payloads are stored as JSON text, so the envelope is spliced together rather than re-encoded
+        items = ",".join(f'{{"seq":{seq},"t":{created!r},"path":{json.dumps(path)},"payload":{payload}}}'
+                         for seq, created, path, payload, _ in rows)
+        body = f'{{"source":{json.dumps(self.outbox.source)},"items":[{items}]}}'
+        resp = self._post("/ingest", body, len(body) >= GZIP_MIN_BYTES or any(row[4] for row in rows))
+        if resp is None:
+            return False
+        if resp.status_code in (404, 405):
+            print("Dashboard has no /ingest endpoint, falling back to one post per item")
+            self._bulk = False
+            self._bulk_retry_at = time.time() + BULK_RETRY_INTERVAL
+            return self._upload_each(rows)
+        if resp.status_code == 413 and len(rows) > 1:
+            # Too large for the dashboard (or a proxy in front of it): halve the batch from now on
+            half = len(rows) // 2
+            self.batch_size = min(self.batch_size, half)
+            return self._upload(rows[:half]) and self._upload(rows[half:])
+
+        if self._rejected(resp) or (resp.status_code == 413 and len(rows) == 1):
+            # Rejected as a whole; resending the same posts cannot succeed
+            print(f"Dashboard rejected {len(rows)} posts: {resp.status_code} {resp.text[:200]}")
+            acked = rows[-1][0]
+        elif resp.status_code == 200:
+            try:
+                acked = int(resp.json()["acked"])
+            except (ValueError, TypeError, KeyError, AttributeError):
+                # Not the dashboard answering (captive portal, proxy page); keep the posts
+                return False
+        elif resp.status_code == 500:
+            # An application error may be caused by one post; do not retry the same batch forever
+            return self._server_error(rows, resp)
+        else:
+            # Auth failures, proxy errors, 5xx: keep the posts and back off
+            return False
+        self.sent += sum(1 for row in rows if row[0] <= acked)
+        self.outbox.ack(acked)
+        self._server_errors = (None, 0)
+        return True
+
+    def _upload_each(self, rows):
+        """Fallback for dashboards without /ingest: one post per item, stopping at the first failure"""
+        for seq, _, path, payload, compress in rows:
+            resp = self._post(path, payload, compress, seq)
+            if resp is None:
+                return False
+            if self._rejected(resp) or resp.status_code == 413:
+                print(f"Dashboard rejected {path}: {resp.status_code} {resp.text[:200]}")
+            elif resp.status_code == 500:
+                if self._server_error([(seq, None, path, payload, compress)], resp):
+                    continue
+                return False
+            elif not 200 <= resp.status_code < 300:
+                return False
+            else:
+                self.sent += 1
+            self.outbox.ack(seq)
+        return True
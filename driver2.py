@@ -1,15 +1,30 @@
 import cv2
 import numpy as np
 import dlib
-from imutils import face_utils
 import time
 import os
-import json
 import datetime
 from geopy.geocoders import Nominatim
 import threading
-import requests
-import subprocess
+import sys
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from config import CONFIG_FILE, load_driver_config
+from alert_store import open_store
+from dispatcher import Dispatcher
+from outbox import OUTBOX_DB_FILE, mark_local_source
+from pipeline import Pipeline
+from face_tracker import FaceTracker, ScaledDetector
+from ear import EyeBuffer
+from smoothing import FaceSmoothers
+from calibration import load_profile, save_profile, build_profile, OnlineRecalibrator
+from location import make_location_provider
+from geocoding import make_reverse_geocoder
+from telemetry import LocationBatcher
+from state_machine import DriverState, ALARM, ALERT, STATUS_COLORS, STATE_CHANGE_FRAMES, AWAKE_MARGIN, SLEEP_MARGIN
+from traces import NO_FACE, TraceRecorder, trace_base
+from overlay import FrameBuffers, display_available, draw_status_overlay, text_size, wrap_text
+from metrics import histogram, counter, gauge, start_http_server, CProfileToggle
 
 # Cross-platform audio alert support
 try:
@@ -17,421 +32,670 @@ try:
 except ImportError:
     winsound = None
 
-# Driver configuration file path
-CONFIG_FILE = "driver_config.json"
+# Hot-path instrumentation, exposed on /metrics (metrics_port)
+STAGE_SECONDS = histogram("drowsiness_stage_seconds", "Per-frame time in each detection stage", ["stage"])
+FRAME_SECONDS = histogram("drowsiness_frame_seconds", "Detection time per frame, all stages")
+RENDER_SECONDS = histogram("drowsiness_render_seconds", "Time to draw the overlay and display a frame")
+ALERT_DISPATCH_SECONDS = histogram("drowsiness_alert_dispatch_seconds", "Time to store and queue an alert")
+ALERT_LATENCY_SECONDS = histogram("drowsiness_alert_latency_seconds", "Frame capture to alert dispatch")
+FRAMES = counter("drowsiness_frames", "Frames analysed")
+ALERTS = counter("drowsiness_alerts", "Alerts raised", ["status"])
+FRAMES_DROPPED = gauge("drowsiness_frames_dropped", "Frames dropped by the pipeline since start")
+QUEUE_DEPTH = gauge("drowsiness_queue_depth", "Items waiting in internal queues", ["queue"])
+_STAGE_HISTOGRAMS = {stage: STAGE_SECONDS.labels(stage) for stage in ("detect", "predict", "ear", "state")}
 
-# Load driver information from config file if available
-def load_driver_config():
-    if os.path.exists(CONFIG_FILE):
+SHAPE_PREDICTOR_PATH = "./shape_predictor_68_face_landmarks.dat"
+# Eye-only landmark model, trained with train_eye_predictor.py
+EYE_PREDICTOR_PATH = "./shape_predictor_eyes.dat"
+
+# Models are loaded once per process and shared by every engine
+_model_cache = {}
+_model_lock = threading.Lock()
+
+def load_shape_predictor(path=SHAPE_PREDICTOR_PATH):
+    """Load (or fetch from cache) the dlib landmark model"""
+    with _model_lock:
+        if path not in _model_cache:
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"'{path}' not found. Download it from: "
+                    "http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2"
+                )
+            _model_cache[path] = dlib.shape_predictor(path)
+        return _model_cache[path]
+
+def load_face_detector():
+    """Load (or fetch from cache) the dlib HOG face detector"""
+    with _model_lock:
+        if "hog" not in _model_cache:
+            _model_cache["hog"] = dlib.get_frontal_face_detector()
+        return _model_cache["hog"]
+
+class DrowsinessEngine:
+    """Drowsiness detection engine: models, camera, calibration and the detection loop.
+
+    Constructing an engine touches no hardware and loads no models; the
+    detector and predictor load lazily on first use, and `start()` loads
+    them in parallel with camera warm-up while recording how long each
+    startup phase took.
+    """
+
+    def __init__(self, driver_info=None, config_file=CONFIG_FILE, camera_index=0):
+        self.config_file = config_file
+        self.driver_info = driver_info if driver_info is not None else load_driver_config(config_file)
+        self.camera_index = camera_index
+        info = self.driver_info
+
+        # Alert configuration (loaded from config, with sensible defaults)
+        self.sleep_alert_threshold = info.get("sleep_alert_threshold", 5)  # seconds
+        self.drowsy_alert_threshold = info.get("drowsy_alert_threshold", 7)  # seconds
+        # State machine tuning (see tune.py): zone margins around the calibrated EARs, frames to confirm a state
+        self.awake_margin = info.get("awake_margin", AWAKE_MARGIN)
+        self.sleep_margin = info.get("sleep_margin", SLEEP_MARGIN)
+        self.state_change_frames = info.get("state_change_frames", STATE_CHANGE_FRAMES)
+        # Directory for per-session EAR traces (None disables recording)
+        self.ear_trace_dir = info.get("ear_trace_dir")
+        self.camera_width = info.get("camera_width", 640)
+        self.camera_height = info.get("camera_height", 480)
+        self.location_update_interval = info.get("location_update_interval", 5)  # seconds
+        self.dashboard_url = info.get("dashboard_url", "http://localhost:5000")
+        # Undelivered dashboard posts survive restarts here; the oldest location posts go first past the cap
+        self.outbox_file = info.get("outbox_file", OUTBOX_DB_FILE)
+        self.outbox_max_rows = info.get("outbox_max_rows", 200000)
+        self.location_batching = info.get("location_batching", True)
+        self.location_batch_size = info.get("location_batch_size", 20)
+        self.location_batch_interval = info.get("location_batch_interval", 5)  # seconds
+        self.location_batch_gzip = info.get("location_batch_gzip", False)
+        # Pipeline mode runs capture, inference and rendering on separate threads
+        self.pipeline_mode = info.get("pipeline_mode", False)
+        # Face detection runs on a downscaled copy (detect_scale), landmarks on the full-resolution frame
+        self.detect_scale = info.get("detect_scale", 1.0)
+        # Detect-then-track: full HOG detection only every detect_interval frames or when tracking degrades
+        self.face_tracking = info.get("face_tracking", False)
+        self.detect_interval = info.get("detect_interval", 10)  # frames
+        self.tracker_min_confidence = info.get("tracker_min_confidence", 7.0)
+        # Calibration profiles are stored per driver id
+        self.calibration_max_age_days = info.get("calibration_max_age_days", 30)
+        self.online_recalibration = info.get("online_recalibration", False)
+        self.shape_predictor_path = info.get("shape_predictor_path", SHAPE_PREDICTOR_PATH)
+        # "eyes" swaps in the much smaller 12-point eye-only model; "68" is the full face model
+        self.landmark_model = info.get("landmark_model", "68")
+        self.eye_predictor_path = info.get("eye_predictor_path", EYE_PREDICTOR_PATH)
+        # Prometheus-style /metrics endpoint, off unless a port is configured; profiling adds /debug/profile
+        self.metrics_port = info.get("metrics_port", 0)
+        self.metrics_host = info.get("metrics_host", "127.0.0.1")
+        self.profiling = info.get("profiling", False)
+        # Headless skips mirroring, drawing and windows; "auto" turns it on when no display is attached
+        headless = info.get("headless", "auto")
+        self.headless = not display_available() if headless == "auto" else bool(headless)
+
+        self._detector = None
+        self._predictor = None
+        self._face_tracker = None
+        self._lazy_lock = threading.Lock()
+
+        self.cap = None
+        self.dispatcher = None
+        self.alert_store = None
+        self.geolocator = None
+        self.location_batcher = None
+        self.reverse_geocoder = None
+        self.location_provider = None
+        self._last_location_push = 0
+        self.recalibrator = None
+        self.current_location = {"latitude": 0, "longitude": 0, "address": "Unknown"}
+
+        # Reused grayscale / mirror outputs: one set for the analysing thread, one for the display thread
+        self.analysis_buffers = FrameBuffers()
+        self.display_buffers = FrameBuffers()
+        # Preallocated eye-landmark buffer shared by calibration and the main loop
+        self.eye_buffer = EyeBuffer()
+        # Per-face EAR smoothing; filter selected by "ear_filter" (moving_average, ema, median, one_euro)
+        self.face_smoothers = FaceSmoothers(info)
+
+        # Calibration thresholds
+        self.calibration_profile = None
+        self.awake_ear = None
+        self.drowsy_ear = None
+        self.sleep_ear = None
+
+        # Driver state; thresholds are filled in by set_profile
+        self.state = DriverState(drowsy_alert_threshold=self.drowsy_alert_threshold,
+                                 sleep_alert_threshold=self.sleep_alert_threshold,
+                                 change_frames=self.state_change_frames,
+                                 awake_margin=self.awake_margin, sleep_margin=self.sleep_margin)
+        self.trace = None
+        self.last_alert_latency = None  # seconds from frame capture to alert dispatch
+        self.stage_times = {}  # per-stage durations of the last analysed frame
+        self.metrics_server = None
+        self.cprofile = CProfileToggle()
+
+        # Startup timing report: phase name -> seconds
+        self.startup_timings = {}
+        self._created_at = time.perf_counter()
+        self._first_frame_done = False
+
+    # ------------------------------------------------------------------
+    # Lazy models and startup
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def timed(self, phase):
+        start = time.perf_counter()
         try:
-            with open(CONFIG_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading driver configuration: {e}")
-    
-    # Default driver information if config file not available
-    return {
-        "name": "John Doe",
-        "id": "DRV12345",
-        "vehicle": "TN-01-AB-1234",
-        "phone": "+1-555-123-4567"
-    }
-
-# Load driver information
-DRIVER_INFO = load_driver_config()
-print(f"Driver: {DRIVER_INFO['name']} ({DRIVER_INFO['id']})")
-print(f"Vehicle: {DRIVER_INFO['vehicle']}")
-print(f"Contact: {DRIVER_INFO['phone']}")
-
-# Alert configuration (loaded from config, with sensible defaults)
-SLEEP_ALERT_THRESHOLD = DRIVER_INFO.get("sleep_alert_threshold", 5)  # seconds
-DROWSY_ALERT_THRESHOLD = DRIVER_INFO.get("drowsy_alert_threshold", 7)  # seconds
-CAMERA_WIDTH = DRIVER_INFO.get("camera_width", 640)
-CAMERA_HEIGHT = DRIVER_INFO.get("camera_height", 480)
-LOCATION_UPDATE_INTERVAL = DRIVER_INFO.get("location_update_interval", 5)  # seconds
-alert_start_time = None
-drowsy_alert_start_time = None
-alert_sent = False
-drowsy_alert_sent = False
-
-# Location tracking setup
-geolocator = Nominatim(user_agent="driver_drowsiness_detector")
-current_location = {"latitude": 0, "longitude": 0, "address": "Unknown"}
-
-def get_windows_location():
-    """Get location using Windows Location API via PowerShell"""
-    try:
-        # Run PowerShell script with ExecutionPolicy Bypass
-        result = subprocess.run(
-            ['powershell.exe', '-ExecutionPolicy', 'Bypass', '-File', './get_location.ps1'],
-            capture_output=True,
-            text=True
-        )
-        
-        # Parse the JSON output
-        location_data = json.loads(result.stdout)
-        
-        if location_data.get('error') is None:
-            return location_data['latitude'], location_data['longitude']
-        else:
-            print(f"Error getting location: {location_data['error']}")
-            return None, None
-    except Exception as e:
-        print(f"Error running PowerShell script: {e}")
-        return None, None
-
-def update_location():
-    """Get real location from Windows Location API"""
-    try:
-        latitude, longitude = get_windows_location()
-        
-        if latitude is not None and longitude is not None:
-            current_location["latitude"] = latitude
-            current_location["longitude"] = longitude
-            
-            # Get address using geocoding
-            try:
-                location = geolocator.reverse(f"{latitude}, {longitude}", exactly_one=True)
-                current_location["address"] = location.address if location else "Unknown"
-                print(f"Location updated: {current_location['address']}")
-                
-                # Send location update to dashboard
+            yield
+        finally:
+            self.startup_timings[phase] = time.perf_counter() - start
+
+    @property
+    def detector(self):
+        if self._detector is None:
+            with self._lazy_lock:
+                if self._detector is None:
+                    with self.timed("detector"):
+                        self._detector = ScaledDetector(load_face_detector(), self.detect_scale)
+        return self._detector
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            with self._lazy_lock:
+                if self._predictor is None:
+                    with self.timed("predictor"):
+                        self._predictor = load_shape_predictor(self.landmark_model_path())
+        return self._predictor
+
+    def landmark_model_path(self):
+        """Path of the configured landmark model, falling back to the 68-point model"""
+        if self.landmark_model != "eyes":
+            return self.shape_predictor_path
+        if os.path.exists(self.eye_predictor_path):
+            return self.eye_predictor_path
+        print(f"Eye-only model '{self.eye_predictor_path}' not found (train it with train_eye_predictor.py); "
+              "using the 68-point model")
+        return self.shape_predictor_path
+
+    @property
+    def face_tracker(self):
+        if self._face_tracker is None and self.face_tracking:
+            self._face_tracker = FaceTracker(self.detector, self.detect_interval, self.tracker_min_confidence)
+        return self._face_tracker
+
+    def load_models(self):
+        """Force the lazy models to load (used to overlap loading with camera warm-up)"""
+        return self.detector, self.predictor
+
+    def open_camera(self):
+        """Open and warm up the webcam (the first read is usually the slowest)"""
+        with self.timed("camera"):
+            # Initialize webcam with higher FPS
+            self.cap = cv2.VideoCapture(self.camera_index)
+            self.cap.set(cv2.CAP_PROP_FPS, 30)  # Request 30 FPS
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.camera_width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.camera_height)
+            self.cap.read()
+        return self.cap
+
+    def start_services(self):
+        """Start the alert store, dashboard dispatcher and location provider"""
+        with self.timed("services"):
+            # Alert logging system (append-only SQLite store, migrates driver_alerts.json once)
+            self.alert_store = open_store()
+            # Dashboard posts land in a durable outbox and a background worker uploads them in bulk,
+            # so the frame loop never waits on the network and nothing is lost while offline
+            self.dispatcher = Dispatcher(self.dashboard_url, self.outbox_file, max_rows=self.outbox_max_rows)
+            # A dashboard sharing this alert store must not store our uploaded alerts a second time
+            mark_local_source(self.alert_store, self.dispatcher.outbox.source)
+            self.dispatcher.start()
+            QUEUE_DEPTH.labels("outbox").set_function(self.dispatcher.pending)
+            QUEUE_DEPTH.labels("outbox_dead").set_function(self.dispatcher.dead_letters)
+            if self.location_batching:
+                # Fixes are buffered and posted as delta-encoded batches to /location_batch
+                self.location_batcher = LocationBatcher(
+                    self.dispatcher, self.driver_info.get("id"), self.location_batch_size,
+                    self.location_batch_interval, self.location_batch_gzip,
+                    vehicle=self.driver_info.get("vehicle")).start()
+                QUEUE_DEPTH.labels("location_batch").set_function(lambda: len(self.location_batcher.fixes))
+            if self.metrics_port:
                 try:
-                    requests.post("http://localhost:5000/location_update", 
-                                json=current_location,
-                                timeout=1)
-                except Exception:
-                    print("Could not send location update to dashboard")
-                    
+                    self.metrics_server = start_http_server(self.metrics_port, self.metrics_host,
+                                                            self.cprofile, self.profiling)
+                    print(f"Metrics on http://{self.metrics_host}:{self.metrics_port}/metrics")
+                except OSError as e:
+                    print(f"Metrics endpoint disabled: {e}")
+
+            # Location tracking setup
+            self.geolocator = Nominatim(user_agent="driver_drowsiness_detector")
+            # Geohash-cell cache, movement threshold and rate limit in front of Nominatim
+            self.reverse_geocoder = make_reverse_geocoder(self.driver_info, self.geolocator)
+            # Long-lived provider (persistent watcher, gpsd, NMEA, replay) pushes fixes to on_location_fix
+            try:
+                self.location_provider = make_location_provider(self.driver_info)
             except Exception as e:
-                print(f"Error getting address: {e}")
-                current_location["address"] = f"Location at {latitude}, {longitude}"
-        else:
-            print("Could not get location from Windows Location API")
-    except Exception as e:
-        print(f"Error updating location: {e}")
+                print(f"Location tracking disabled: {e}")
+            if self.location_provider is not None:
+                self.location_provider.start(self.on_location_fix)
 
-# Start a thread to update location periodically
-def location_updater():
-    while True:
-        update_location()
-        time.sleep(LOCATION_UPDATE_INTERVAL)
+    def start(self, recalibrate=False):
+        """Load models, open the camera, start services and calibrate"""
+        with self.timed("startup"):
+            # Models load on a worker thread while the camera warms up on this one
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader") as pool:
+                models = pool.submit(self.load_models)
+                self.open_camera()
+                self.start_services()
+                models.result()
+            with self.timed("calibration"):
+                self.calibrate(recalibrate)
+        if self.ear_trace_dir:
+            self.start_trace(trace_base(self.driver_info.get("id"), self.ear_trace_dir))
 
-location_thread = threading.Thread(target=location_updater, daemon=True)
-location_thread.start()
+    def startup_report(self):
+        """Human-readable breakdown of time spent in each startup phase"""
+        order = ["detector", "predictor", "camera", "services", "calibration", "startup", "first_frame"]
+        lines = ["Startup timing:"]
+        for phase in order:
+            if phase in self.startup_timings:
+                lines.append(f"  {phase:<12} {1000 * self.startup_timings[phase]:8.1f} ms")
+        return "\n".join(lines)
 
-# Alert logging system
-ALERTS_FILE = "driver_alerts.json"
+    def _mark_first_frame(self):
+        if not self._first_frame_done:
+            self._first_frame_done = True
+            self.startup_timings["first_frame"] = time.perf_counter() - self._created_at
+            print(self.startup_report())
 
-def log_alert(status, duration):
-    """Log an alert to the JSON file and send to dashboard"""
-    try:
-        alert_data = {
-            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "driver": DRIVER_INFO,
-            "status": status,
-            "duration": duration,
-            "location": current_location
-        }
-        
-        # Load existing alerts or create new list
-        if os.path.exists(ALERTS_FILE):
-            with open(ALERTS_FILE, "r") as f:
-                alerts = json.load(f)
+    # ------------------------------------------------------------------
+    # Location and alerts
+    # ------------------------------------------------------------------
+
+    def on_location_fix(self, latitude, longitude):
+        """Take a fix pushed by the location provider (runs on the provider's thread)"""
+        current_location = self.current_location
+        current_location["latitude"] = latitude
+        current_location["longitude"] = longitude
+        now = time.time()
+        if self.location_batcher is not None:
+            # Every fix goes into the track; the batcher decides when to send
+            self.location_batcher.add(latitude, longitude, timestamp=now)
+
+        # Providers may stream several fixes a second; geocode at most once per interval
+        if now - self._last_location_push < self.location_update_interval:
+            return
+        self._last_location_push = now
+
+        # Get address (cached per geohash cell, skipped while parked, rate limited)
+        if self.reverse_geocoder is not None:
+            address = self.reverse_geocoder.address(latitude, longitude)
         else:
-            alerts = []
-        
-        # Insert new alert at the beginning of the list (instead of appending)
-        alerts.insert(0, alert_data)
-        with open(ALERTS_FILE, "w") as f:
-            json.dump(alerts, f, indent=4)
-        
-        # Send alert to web dashboard if it's running
+            address = f"Location at {latitude}, {longitude}"
+        if address != current_location["address"]:
+            print(f"Location updated: {address}")
+        current_location["address"] = address
+
+        # Queue location update for the dashboard
+        if self.location_batcher is not None:
+            self.location_batcher.address = address
+        elif self.dispatcher is not None:
+            self.dispatcher.submit("/location_update", dict(current_location, driver_id=self.driver_info.get("id"),
+                                                            vehicle=self.driver_info.get("vehicle")))
+
+    def log_alert(self, status, duration):
+        """Log an alert to the alert store and send to dashboard"""
+        ALERTS.labels(status).inc()
+        start = time.perf_counter()
         try:
-            requests.post("http://localhost:5000/alert", json=alert_data, timeout=1)
-        except Exception:
-            pass  # Dashboard might not be running, that's OK
-            
-        print(f"Alert logged: {status} - {current_location['address']}")
-    except Exception as e:
-        print(f"Error logging alert: {e}")
-
-# Initialize webcam with higher FPS
-cap = cv2.VideoCapture(0)
-cap.set(cv2.CAP_PROP_FPS, 30)  # Request 30 FPS
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
-
-detector = dlib.get_frontal_face_detector()
+            alert_data = {
+                "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "driver": self.driver_info,
+                "status": status,
+                "duration": duration,
+                "location": dict(self.current_location)
+            }
 
-SHAPE_PREDICTOR_PATH = "./shape_predictor_68_face_landmarks.dat"
-if not os.path.exists(SHAPE_PREDICTOR_PATH):
-    raise FileNotFoundError(
-        f"'{SHAPE_PREDICTOR_PATH}' not found. Download it from: "
-        "http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2"
-    )
-predictor = dlib.shape_predictor(SHAPE_PREDICTOR_PATH)
-
-# Calibration variables
-awake_ear = None
-drowsy_ear = None
-sleep_ear = None
-
-# Constants for state changes - reduced for faster response
-STATE_CHANGE_FRAMES = 3  # Reduced from 6 to 3 frames
-FRAME_BUFFER_SIZE = 5  # Keep track of last 5 EAR values for smoothing
-
-# Buffer for EAR values to smooth out detection
-ear_buffer = []
-
-def smooth_ear(ear_value):
-    """Smooth EAR values using moving average"""
-    global ear_buffer
-    ear_buffer.append(ear_value)
-    if len(ear_buffer) > FRAME_BUFFER_SIZE:
-        ear_buffer.pop(0)
-    return sum(ear_buffer) / len(ear_buffer)
-
-def compute(ptA, ptB):
-    return np.linalg.norm(ptA - ptB)
-
-def get_ear(landmarks):
-    left = compute(landmarks[37], landmarks[41]) + compute(landmarks[38], landmarks[40])
-    right = compute(landmarks[43], landmarks[47]) + compute(landmarks[44], landmarks[46])
-    down_left = compute(landmarks[36], landmarks[39])
-    down_right = compute(landmarks[42], landmarks[45])
-    return (left + right) / (2.0 * (down_left + down_right))
-
-def calibrate_phase(message, duration=10):
-    start_time = time.time()
-    ear_values = []
-    
-    # Get initial frame to determine dimensions
-    ret, frame = cap.read()
-    if not ret:
-        return 0.2  # Default fallback
-        
-    height, width = frame.shape[:2]
-    
-    while time.time() - start_time < duration:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Flip frame horizontally for mirror effect
-        frame = cv2.flip(frame, 1)
-        
-        # Calculate remaining time
-        remaining = duration - int(time.time() - start_time)
-        
-        # Split message into multiple lines if too long
-        words = message.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            current_line.append(word)
-            # Check if current line would be too long
-            test_line = ' '.join(current_line)
-            text_size = cv2.getTextSize(test_line, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-            if text_size[0] > width - 100:  # Leave 50px margin on each side
-                lines.append(' '.join(current_line[:-1]))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        # Draw text with proper spacing
-        y_position = 50
-        for line in lines:
-            cv2.putText(frame, line, (30, y_position), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            y_position += 30
-        
-        # Add time remaining below instructions
-        y_position += 10  # Add some space
-        cv2.putText(frame, f"Time left: {remaining} seconds", 
-                   (30, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        
-        # Calculate and display current EAR value
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = detector(gray)
-        for face in faces:
-            landmarks = predictor(gray, face)
-            landmarks = face_utils.shape_to_np(landmarks)
-            ear = get_ear(landmarks)
-            ear_values.append(ear)
-            
-            # Show EAR value below time remaining
-            y_position += 30
-            cv2.putText(frame, f"EAR: {ear:.2f}", 
-                       (30, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        cv2.imshow("Calibration", frame)
-        if cv2.waitKey(1) == 27:
-            break
-    
-    # Display completion message
-    if ear_values:
-        completion_frame = np.zeros((height, width, 3), dtype=np.uint8)
-        messages = [
-            "Calibration Complete!",
-            f"Average EAR: {np.mean(ear_values):.2f}"
-        ]
-        
-        y_position = height // 3
-        for msg in messages:
-            text_size = cv2.getTextSize(msg, cv2.FONT_HERSHEY_SIMPLEX, 1, 2)[0]
-            x_position = (width - text_size[0]) // 2
-            cv2.putText(completion_frame, msg, (x_position, y_position),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            y_position += 50
-        
-        cv2.imshow("Calibration", completion_frame)
-        cv2.waitKey(1000)  # Show completion message for 1 second
-        
-    return np.mean(ear_values) if ear_values else 0.2  # Default fallback
-
-# Calibration process
-awake_ear = calibrate_phase("Look straight with your eyes open for calibration...")
-drowsy_ear = calibrate_phase("Half-close your eyes (simulate drowsiness)...")
-sleep_ear = calibrate_phase("Close your eyes completely...")
-
-cv2.destroyAllWindows()
-
-sleep = 0
-drowsy = 0
-active = 0
-status = ""
-color = (0, 0, 0)
-beep_played = False
-prev_time = time.time()
-fps = 0
+            # Constant-time append, independent of the size of the history
+            if self.alert_store is not None:
+                self.alert_store.append(alert_data)
 
-try:
-    while True:
+            # Queue alert for the web dashboard (kept in the outbox until the dashboard acknowledges it)
+            if self.dispatcher is not None:
+                self.dispatcher.submit("/alert", alert_data)
+
+            print(f"Alert logged: {status} - {self.current_location['address']}")
+        except Exception as e:
+            print(f"Error logging alert: {e}")
+        ALERT_DISPATCH_SECONDS.observe(time.perf_counter() - start)
+
+    # ------------------------------------------------------------------
+    # Detection
+    # ------------------------------------------------------------------
+
+    def locate_faces(self, gray):
+        """Find face rectangles, via the tracker when face tracking is enabled"""
+        if self.face_tracker is not None:
+            return self.face_tracker.locate(gray)
+        # Left-to-right order keeps per-face smoothing slots stable
+        return sorted(self.detector(gray), key=lambda r: r.left())
+
+    def face_ears(self, gray):
+        """Raw EAR of every face in a grayscale frame"""
+        faces = self.locate_faces(gray)
+        shapes = [self.predictor(gray, face) for face in faces]
+        return self.eye_buffer.ears(shapes)
+
+    def calibrate_phase(self, message, duration=10):
+        """Show `message` for `duration` seconds and return the raw EAR values observed"""
+        cap = self.cap
+        start_time = time.time()
+        ear_values = []
+
+        # Get initial frame to determine dimensions
         ret, frame = cap.read()
         if not ret:
-            break
-            
-        # Calculate FPS
-        current_time = time.time()
-        fps = 1 / (current_time - prev_time)
-        prev_time = current_time
-        
-        # Flip frame horizontally for mirror effect
-        frame = cv2.flip(frame, 1)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = detector(gray)
-        
+            return []
+
         height, width = frame.shape[:2]
-        y_position = 50
-        
-        # Display FPS
-        cv2.putText(frame, f"FPS: {fps:.1f}", (10, 30), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        # Display status with background for better visibility
-        status_size = cv2.getTextSize(status, cv2.FONT_HERSHEY_SIMPLEX, 1.2, 3)[0]
-        status_x = (width - status_size[0]) // 2
-        
-        # Draw semi-transparent background for text
-        overlay = frame.copy()
-        cv2.rectangle(overlay, 
-                     (status_x - 10, y_position - 40),
-                     (status_x + status_size[0] + 10, y_position + 10),
-                     (0, 0, 0),
-                     -1)
-        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
-        
-        # Draw status text
-        cv2.putText(frame, status, (status_x, y_position), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, 3)
-        
-        for face in faces:
-            landmarks = predictor(gray, face)
-            landmarks = face_utils.shape_to_np(landmarks)
-            ear = get_ear(landmarks)
-            
-            # Smooth EAR value
-            smoothed_ear = smooth_ear(ear)
-            
-            # Adjusted thresholds with smoothed EAR
-            if smoothed_ear >= awake_ear * 0.85:  # Slightly more lenient threshold
-                sleep = 0
-                drowsy = 0
-                active += 1
-                if active >= STATE_CHANGE_FRAMES:
-                    status = "Active :)" 
-                    color = (0, 255, 0)
-                    beep_played = False
-                    active = STATE_CHANGE_FRAMES  # Cap the counter
-                    # Reset alert state if active
-                    if alert_start_time is not None:
-                        alert_start_time = None
-                        alert_sent = False
-                    if drowsy_alert_start_time is not None:
-                        drowsy_alert_start_time = None
-                        drowsy_alert_sent = False
-            elif smoothed_ear < awake_ear * 0.85 and smoothed_ear > sleep_ear * 1.1:  # Better drowsy range between awake and sleep
-                sleep = 0
-                active = 0
-                drowsy += 1
-                if drowsy >= STATE_CHANGE_FRAMES:
-                    status = "Drowsy !"
-                    color = (0, 255, 255)
-                    drowsy = STATE_CHANGE_FRAMES  # Cap the counter
-                    # Only start the timer once when entering drowsy state
-                    if drowsy_alert_start_time is None:
-                        drowsy_alert_start_time = time.time()
-                    elif time.time() - drowsy_alert_start_time > DROWSY_ALERT_THRESHOLD and not drowsy_alert_sent:
-                        log_alert(status, time.time() - drowsy_alert_start_time)
-                        drowsy_alert_sent = True
-            elif smoothed_ear <= sleep_ear * 1.1:  # Slightly more lenient sleep threshold
-                active = 0
-                drowsy = 0
-                sleep += 1
-                if sleep >= STATE_CHANGE_FRAMES:
-                    status = "SLEEPING !!!"
-                    color = (0, 0, 255)
-                    sleep = STATE_CHANGE_FRAMES  # Cap the counter
-                    
-                    # Only play sound once when entering sleep state
-                    if not beep_played:
-                        if winsound:
-                            winsound.PlaySound("beep (2).wav", winsound.SND_ASYNC)
-                        else:
-                            print("\a")  # Terminal bell as cross-platform fallback
-                        beep_played = True
-                        
-                    # Only start the timer once when entering sleep state
-                    if alert_start_time is None:
-                        alert_start_time = time.time()
-                    elif time.time() - alert_start_time > SLEEP_ALERT_THRESHOLD and not alert_sent:
-                        log_alert(status, time.time() - alert_start_time)
-                        alert_sent = True
-            
-            # Display EAR values
-            y_position += 40
-            ear_text = f"EAR: {smoothed_ear:.2f} (Raw: {ear:.2f})"
-            ear_size = cv2.getTextSize(ear_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-            ear_x = (width - ear_size[0]) // 2
-            
-            # Draw background for EAR value
-            cv2.rectangle(frame,
-                         (ear_x - 5, y_position - 25),
-                         (ear_x + ear_size[0] + 5, y_position + 5),
-                         (0, 0, 0),
-                         -1)
-            cv2.putText(frame, ear_text, (ear_x, y_position),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-        cv2.imshow("Driver Drowsiness Detector", frame)
-        
-        if cv2.waitKey(1) == 27:
-            break
-
-finally:
-    cap.release()
-    cv2.destroyAllWindows()
-    print("Cleanup complete: camera released and windows closed.")
\ No newline at end of file
+        # Wrapped once per message instead of measuring every word on every frame
+        lines = wrap_text(message, width - 100)  # Leave 50px margin on each side
+        if self.headless:
+            print(f"Calibration: {message} ({duration} seconds)")
+
+        while time.time() - start_time < duration:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            # Calculate and collect the current EAR values
+            frame_ears = [float(ear) for ear in self.face_ears(self.analysis_buffers.gray(frame))]
+            ear_values.extend(frame_ears)
+            if self.headless:
+                continue
+
+            # Flip frame horizontally for mirror effect
+            frame = self.display_buffers.mirror(frame)
+
+            # Calculate remaining time
+            remaining = duration - int(time.time() - start_time)
+
+            # Draw text with proper spacing
+            y_position = 50
+            for line in lines:
+                cv2.putText(frame, line, (30, y_position),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+                y_position += 30
+
+            # Add time remaining below instructions
+            y_position += 10  # Add some space
+            cv2.putText(frame, f"Time left: {remaining} seconds",
+                       (30, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+            for ear in frame_ears:
+                # Show EAR value below time remaining
+                y_position += 30
+                cv2.putText(frame, f"EAR: {ear:.2f}",
+                           (30, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+            cv2.imshow("Calibration", frame)
+            if cv2.waitKey(1) == 27:
+                break
+
+        # Display completion message
+        if ear_values and self.headless:
+            print(f"Calibration phase complete, average EAR: {np.mean(ear_values):.2f}")
+        elif ear_values:
+            completion_frame = np.zeros((height, width, 3), dtype=np.uint8)
+            messages = [
+                "Calibration Complete!",
+                f"Average EAR: {np.mean(ear_values):.2f}"
+            ]
+
+            y_position = height // 3
+            for msg in messages:
+                x_position = (width - text_size(msg, 1, 2)[0]) // 2
+                cv2.putText(completion_frame, msg, (x_position, y_position),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                y_position += 50
+
+            cv2.imshow("Calibration", completion_frame)
+            cv2.waitKey(1000)  # Show completion message for 1 second
+
+        return ear_values
+
+    def calibrate(self, recalibrate=False):
+        """Load the driver's calibration profile, or run the calibration phases"""
+        driver_id = self.driver_info["id"]
+        profile = None
+        if not recalibrate:
+            profile = load_profile(driver_id, self.calibration_max_age_days, self.config_file)
+
+        if profile is not None:
+            print(f"Loaded calibration profile for {driver_id} "
+                  f"(calibrated {profile.get('calibrated_at') or profile.get('created_at')})")
+        else:
+            # Calibration process
+            awake_samples = self.calibrate_phase("Look straight with your eyes open for calibration...")
+            drowsy_samples = self.calibrate_phase("Half-close your eyes (simulate drowsiness)...")
+            sleep_samples = self.calibrate_phase("Close your eyes completely...")
+            if not self.headless:
+                cv2.destroyAllWindows()
+
+            profile = build_profile(awake_samples, drowsy_samples, sleep_samples)
+            # Only keep profiles where every phase actually saw a face
+            if awake_samples and drowsy_samples and sleep_samples:
+                save_profile(driver_id, profile, self.config_file)
+
+        self.set_profile(profile)
+        if self.online_recalibration:
+            self.recalibrator = OnlineRecalibrator(driver_id, profile, self.set_awake_ear,
+                                                   config_file=self.config_file).start()
+
+    def set_profile(self, profile):
+        """Use the thresholds of a calibration profile"""
+        self.calibration_profile = profile
+        self.awake_ear = profile["awake_ear"]
+        self.drowsy_ear = profile["drowsy_ear"]
+        self.sleep_ear = profile["sleep_ear"]
+        self.state.set_thresholds(self.awake_ear, self.sleep_ear)
+
+    def start_trace(self, base):
+        """Record every EAR sample fed to the state machine to `<base>.npy` for tune.py"""
+        state = self.state
+        self.trace = TraceRecorder(base, {
+            "driver_id": self.driver_info.get("id"),
+            "awake_ear": self.awake_ear,
+            "drowsy_ear": self.drowsy_ear,
+            "sleep_ear": self.sleep_ear,
+            "awake_margin": state.awake_margin,
+            "sleep_margin": state.sleep_margin,
+            "change_frames": state.change_frames,
+            "drowsy_alert_threshold": state.drowsy_alert_threshold,
+            "sleep_alert_threshold": state.sleep_alert_threshold,
+            "ear_filter": self.driver_info.get("ear_filter", "moving_average"),
+        })
+        print(f"Recording EAR trace to {base}.npy")
+
+    def set_awake_ear(self, value):
+        """Apply an online recalibration result"""
+        self.awake_ear = value
+        self.state.set_thresholds(value, self.sleep_ear)
+        print(f"Online recalibration: awake EAR now {value:.3f}")
+
+    def play_alarm(self):
+        if winsound:
+            winsound.PlaySound("beep (2).wav", winsound.SND_ASYNC)
+        else:
+            print("\a")  # Terminal bell as cross-platform fallback
+
+    @property
+    def status(self):
+        return self.state.status
+
+    @property
+    def color(self):
+        return STATUS_COLORS.get(self.state.status, (0, 0, 0))
+
+    def update_state(self, smoothed_ear, timestamp, captured_at=None):
+        """Feed one smoothed EAR sample to the state machine and act on its events"""
+        for event in self.state.update(timestamp, smoothed_ear):
+            if event.kind == ALARM:
+                self.play_alarm()
+            elif event.kind == ALERT:
+                self.log_alert(event.status, event.duration)
+                self.last_alert_latency = time.time() - (captured_at or timestamp)
+                ALERT_LATENCY_SECONDS.observe(self.last_alert_latency)
+        if self.recalibrator is not None:
+            self.recalibrator.add_sample(smoothed_ear)
+
+    def analyze_gray(self, gray, timestamp, captured_at=None):
+        """Run detection, landmarks, EAR and the state machine on a grayscale frame.
+
+        Returns (smoothed_ear, raw_ear) per face; the time spent in each
+        stage is left in `self.stage_times` (seconds).
+        """
+        t0 = time.perf_counter()
+        faces = self.locate_faces(gray)
+        t1 = time.perf_counter()
+        shapes = [self.predictor(gray, face) for face in faces]
+        t2 = time.perf_counter()
+        # EAR for every face in one vectorized call over the eye landmarks
+        raw_ears = self.eye_buffer.ears(shapes)
+        t3 = time.perf_counter()
+
+        ears = []
+        for slot, ear in enumerate(raw_ears):
+            ear = float(ear)
+
+            # Smooth EAR value with this face's own filter
+            smoothed_ear = self.face_smoothers.update(slot, ear, timestamp)
+            self.update_state(smoothed_ear, timestamp, captured_at)
+            ears.append((smoothed_ear, ear))
+            if self.trace is not None:
+                self.trace.add(timestamp, ear, smoothed_ear, slot)
+        if not ears and self.trace is not None:
+            self.trace.add(timestamp, float("nan"), float("nan"), NO_FACE)
+        self.face_smoothers.retain(len(ears))
+        t4 = time.perf_counter()
+
+        self.stage_times = {"detect": t1 - t0, "predict": t2 - t1, "ear": t3 - t2, "state": t4 - t3}
+        for stage, seconds in self.stage_times.items():
+            _STAGE_HISTOGRAMS[stage].observe(seconds)
+        FRAME_SECONDS.observe(t4 - t0)
+        FRAMES.inc()
+        return ears
+
+    def analyze_frame(self, frame, captured_at):
+        """Detect faces, compute EAR and update the driver state; returns the frame and per-face EARs"""
+        # Starts / stops an armed cProfile run on whichever thread does the analysis
+        self.cprofile.poll()
+        # EAR does not depend on the mirror flip, so analysis reads the camera frame as-is
+        # into a reused grayscale buffer; only the display path flips
+        gray = self.analysis_buffers.gray(frame)
+
+        ears = self.analyze_gray(gray, captured_at, captured_at)
+        self._mark_first_frame()
+        return frame, ears
+
+    # ------------------------------------------------------------------
+    # Display and main loops
+    # ------------------------------------------------------------------
+
+    def draw_overlay(self, frame, ears, stats_lines):
+        """Draw status, EAR values and performance figures onto the frame"""
+        draw_status_overlay(frame, self.status, self.color, ears, stats_lines)
+
+    def show(self, frame, ears, stats_lines):
+        """Mirror the frame into the display buffer, draw the overlay and show it; False once Esc is pressed"""
+        with RENDER_SECONDS.time():
+            display = self.display_buffers.mirror(frame)
+            self.draw_overlay(display, ears, stats_lines)
+            cv2.imshow("Driver Drowsiness Detector", display)
+        return cv2.waitKey(1) != 27
+
+    def run_sequential(self):
+        """Capture, analyze and display each frame in turn on the main thread"""
+        prev_time = time.time()
+        while True:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            captured_at = time.time()
+
+            # Calculate FPS
+            fps = 1 / max(captured_at - prev_time, 1e-6)
+            prev_time = captured_at
+
+            frame, ears = self.analyze_frame(frame, captured_at)
+            # Headless: no flip, overlay or window; the loop runs until the camera stops
+            if not self.headless and not self.show(frame, ears, [f"FPS: {fps:.1f}"]):
+                break
+
+    def run_pipelined(self):
+        """Run capture, inference and display as separate pipeline stages"""
+        def analyze(packet):
+            return self.analyze_frame(packet.frame, packet.captured_at)
+
+        def render(packet, pipe):
+            if self.headless:
+                return True
+            frame, ears = packet.result
+            stats_lines = [f"FPS: {pipe.inference_stats.fps:.1f}"]
+            stats_lines += [stage.summary() for stage in pipe.stages]
+            latency_line = f"Latency: {1000 * pipe.last_latency:.0f} ms, dropped {pipe.dropped}"
+            if self.last_alert_latency is not None:
+                latency_line += f", last alert {1000 * self.last_alert_latency:.0f} ms"
+            stats_lines.append(latency_line)
+            return self.show(frame, ears, stats_lines)
+
+        pipe = Pipeline(self.cap, analyze, render)
+        FRAMES_DROPPED.set_function(lambda: pipe.dropped)
+        try:
+            pipe.run()
+        finally:
+            print("Pipeline stages: " + "; ".join(stage.summary() for stage in pipe.stages))
+            print(f"Frames dropped: {pipe.dropped}")
+
+    def run(self):
+        if self.pipeline_mode:
+            self.run_pipelined()
+        else:
+            self.run_sequential()
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+        if not self.headless:
+            cv2.destroyAllWindows()
+        if self.recalibrator is not None:
+            self.recalibrator.stop()
+        if self.location_provider is not None:
+            self.location_provider.stop()
+        if self.reverse_geocoder is not None:
+            self.reverse_geocoder.close()
+        if self.location_batcher is not None:
+            self.location_batcher.stop()
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        if self.trace is not None:
+            self.trace.close()
+        print("Cleanup complete: camera released and windows closed.")
+
+
+def main():
+    engine = DrowsinessEngine()
+    info = engine.driver_info
+    print(f"Driver: {info['name']} ({info['id']})")
+    print(f"Vehicle: {info['vehicle']}")
+    print(f"Contact: {info['phone']}")
+
+    try:
+        # Pass --recalibrate to force a fresh calibration
+        engine.start(recalibrate="--recalibrate" in sys.argv)
+        engine.run()
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import numpy as np
+
+# Landmark indices of the 68-point model used by the EAR. The first four
+# pairs are the vertical eyelid distances (left eye, then right eye), the
+# last two the horizontal eye-corner distances.
+_PAIRS_A = np.array([37, 38, 43, 44, 36, 42])
+_PAIRS_B = np.array([41, 40, 47, 46, 39, 45])
+
+# Eye-only landmark arrays hold points 36-47 of the 68-point model
+EYE_POINTS = np.arange(36, 48)
+# Eye-only predictors (train_eye_predictor.py) output just these 12 points, numbered 0-11
+EYE_MODEL_POINTS = np.arange(len(EYE_POINTS))
+_EYE_PAIRS_A = _PAIRS_A - EYE_POINTS[0]
+_EYE_PAIRS_B = _PAIRS_B - EYE_POINTS[0]
+
+
+def eye_aspect_ratio(landmarks):
+    """Combined EAR of both eyes.
+
+    Accepts full (68, 2) landmarks or eye-only (12, 2) points, or batches of
+    either shaped (N, 68, 2) / (N, 12, 2); a batch returns an (N,) array.
+    """
+    pts = np.asarray(landmarks, dtype=np.float64)
+    if pts.shape[-2] == len(EYE_POINTS):
+        a, b = _EYE_PAIRS_A, _EYE_PAIRS_B
+    else:
+        a, b = _PAIRS_A, _PAIRS_B
+    diff = pts[..., a, :] - pts[..., b, :]
+    dist = np.sqrt(np.einsum("...ij,...ij->...i", diff, diff))
+    return dist[..., :4].sum(axis=-1) / (2.0 * dist[..., 4:].sum(axis=-1))
+
+
+def get_ear(landmarks):
+    """EAR of a single face as a float"""
+    return float(eye_aspect_ratio(landmarks))
+
+
+def shape_to_eye_points(shape, out=None):
+    """Copy the 12 eye landmarks of a dlib shape (68-point or eye-only model) into `out` (allocated if None)"""
+    if out is None:
+        out = np.empty((len(EYE_POINTS), 2), dtype=np.float64)
+    indices = EYE_MODEL_POINTS if shape.num_parts == len(EYE_POINTS) else EYE_POINTS
+    for row, index in enumerate(indices):
+        point = shape.part(int(index))
+        out[row, 0] = point.x
+        out[row, 1] = point.y
+    return out
+
+
+class EyeBuffer:
+    """Preallocated (N, 12, 2) landmark buffer for batch EAR over several faces"""
+
+    def __init__(self, capacity=4):
+        self._buffer = np.empty((capacity, len(EYE_POINTS), 2), dtype=np.float64)
+
+    def ears(self, shapes):
+        """EAR for every dlib shape in `shapes`, computed in one vectorized call"""
+        count = len(shapes)
+        if count == 0:
+            return np.empty(0)
+        if count > len(self._buffer):
+            self._buffer = np.empty((count, len(EYE_POINTS), 2), dtype=np.float64)
+        for i, shape in enumerate(shapes):
+            shape_to_eye_points(shape, self._buffer[i])
+        return eye_aspect_ratio(self._buffer[:count])
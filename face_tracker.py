@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+import dlib
+
+
+class ScaledDetector:
+    """Runs a dlib face detector on a downscaled copy of the frame.
+
+    Detector cost falls roughly with the square of `scale`; the returned
+    rectangles are mapped back to full-resolution coordinates so the
+    landmark predictor still works on the original image.
+    """
+
+    def __init__(self, detector, scale=1.0, upsample=0):
+        if not 0 < scale <= 1:
+            raise ValueError(f"detect scale must be in (0, 1], got {scale}")
+        self.detector = detector
+        self.scale = scale
+        self.upsample = upsample
+
+    def __call__(self, gray):
+        if self.scale == 1.0:
+            return list(self.detector(gray, self.upsample))
+
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        inv = 1.0 / self.scale
+        return [
+            dlib.rectangle(int(r.left() * inv), int(r.top() * inv),
+                           int(r.right() * inv), int(r.bottom() * inv))
+            for r in self.detector(small, self.upsample)
+        ]
+
+
+class FaceTracker:
+    """Detect-then-track face localisation.
+
+    The HOG detector runs every `detect_interval` frames, or as soon as a
+    correlation tracker's confidence (peak-to-sidelobe ratio) drops below
+    `min_confidence`. Re-detection only searches a region around the last
+    known boxes; the full frame is scanned when nothing is being tracked,
+    when the ROI search comes up empty, and every `full_scan_interval`
+    frames so newly appearing faces are still picked up.
+    """
+
+    def __init__(self, detector, detect_interval=10, min_confidence=7.0, roi_margin=0.5,
+                 full_scan_interval=None):
+        self.detector = detector
+        self.detect_interval = max(1, detect_interval)
+        self.min_confidence = min_confidence
+        self.roi_margin = roi_margin
+        self.full_scan_interval = full_scan_interval or self.detect_interval * 10
+        self.trackers = []
+        self.boxes = []
+        self.frame_count = 0
+        self.detections = 0  # number of frames on which the HOG detector ran
+
+    def reset(self):
+        self.trackers = []
+        self.boxes = []
+
+    def locate(self, gray):
+        """Return the face rectangles for this grayscale frame"""
+        self.frame_count += 1
+
+        need_detection = (
+            not self.trackers
+            or self.frame_count % self.detect_interval == 0
+        )
+        if not need_detection:
+            boxes = []
+            for tracker in self.trackers:
+                confidence = tracker.update(gray)
+                if confidence < self.min_confidence:
+                    need_detection = True
+                    break
+                boxes.append(_to_rectangle(tracker.get_position()))
+            if not need_detection:
+                self.boxes = boxes
+                return boxes
+
+        # Left-to-right order keeps face slots stable between detections
+        faces = sorted(self._detect(gray), key=lambda r: r.left())
+        self._start_tracks(gray, faces)
+        return faces
+
+    def _detect(self, gray):
+        self.detections += 1
+        full_scan = not self.boxes or self.frame_count % self.full_scan_interval == 0
+        if not full_scan:
+            faces = self._detect_in_roi(gray)
+            if faces:
+                return faces
+        return list(self.detector(gray))
+
+    def _detect_in_roi(self, gray):
+        """Run the detector on a window around the union of the last boxes"""
+        height, width = gray.shape[:2]
+        left = min(b.left() for b in self.boxes)
+        top = min(b.top() for b in self.boxes)
+        right = max(b.right() for b in self.boxes)
+        bottom = max(b.bottom() for b in self.boxes)
+        margin_x = int((right - left) * self.roi_margin)
+        margin_y = int((bottom - top) * self.roi_margin)
+        x0, y0 = max(0, left - margin_x), max(0, top - margin_y)
+        x1, y1 = min(width, right + margin_x), min(height, bottom + margin_y)
+        if x1 <= x0 or y1 <= y0:
+            return []
+
+        roi = np.ascontiguousarray(gray[y0:y1, x0:x1])
+        return [
+            dlib.rectangle(r.left() + x0, r.top() + y0, r.right() + x0, r.bottom() + y0)
+            for r in self.detector(roi)
+        ]
+
+    def _start_tracks(self, gray, faces):
+        self.trackers = []
+        for face in faces:
+            tracker = dlib.correlation_tracker()
+            tracker.start_track(gray, face)
+            self.trackers.append(tracker)
+        self.boxes = list(faces)
+
+
+def _to_rectangle(drect):
+    return dlib.rectangle(int(drect.left()), int(drect.top()), int(drect.right()), int(drect.bottom()))
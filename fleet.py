@@ -0,0 +1,249 @@
+"""Multi-camera supervisor: one detection worker process per camera.
+
+Each worker owns its camera, driver config and engine state, is pinned to
+its own CPU core, and runs headless. Workers ship compact event tuples
+back over one shared queue; the supervisor is the only process that
+writes the alert store and talks to the dashboard. A box reports to one
+dashboard, so every worker config must name the same `dashboard_url`.
+
+Usage:
+    python fleet.py fleet.json
+
+fleet.json:
+    {
+        "workers": [
+            {"camera": 0, "config": "driver_config_cab1.json"},
+            {"camera": "rtsp://10.0.0.12/stream", "config": "driver_config_cab2.json"}
+        ]
+    }
+"""
+import os
+import sys
+import json
+import time
+import datetime
+import multiprocessing as mp
+import queue
+
+STATS_INTERVAL = 5  # seconds between worker throughput reports
+DEFAULT_DASHBOARD_URL = "http://localhost:5000"
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin_to_core(core):
+    """Pin the current process to one core (Linux only; a no-op elsewhere)"""
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+
+
+def camera_worker(worker_id, camera, config_file, core, events, stop):
+    """Detection loop for one camera; runs in its own process"""
+    try:
+        run_worker(worker_id, camera, config_file, core, events, stop)
+    except Exception as e:
+        events.put(("error", worker_id, f"worker crashed: {e!r}"))
+
+
+def run_worker(worker_id, camera, config_file, core, events, stop):
+    pin_to_core(core)
+
+    # Imported here so the supervisor process never loads OpenCV / dlib
+    import cv2
+    from driver2 import DrowsinessEngine
+    from calibration import load_profile
+
+    # One core per worker: keep OpenCV from spawning its own thread pool
+    cv2.setNumThreads(1)
+
+    class WorkerEngine(DrowsinessEngine):
+        def play_alarm(self):
+            events.put(("alarm", worker_id, time.time()))
+
+        def log_alert(self, status, duration):
+            events.put(("alert", worker_id, status, round(duration, 2), time.time()))
+
+    engine = WorkerEngine(config_file=config_file, camera_index=camera)
+    profile = load_profile(engine.driver_info["id"], engine.calibration_max_age_days, config_file)
+    if profile is None:
+        events.put(("error", worker_id, f"no calibration profile for {engine.driver_info['id']}; "
+                                        "run driver2.py once with this config"))
+        return
+    engine.set_profile(profile)
+    engine.load_models()
+    cap = engine.open_camera()
+
+    frames = 0
+    last_report = time.time()
+    busy = 0.0
+    try:
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                events.put(("error", worker_id, "camera stopped delivering frames"))
+                break
+            start = time.perf_counter()
+            gray = engine.analysis_buffers.gray(frame)
+            engine.analyze_gray(gray, time.time())
+            busy += time.perf_counter() - start
+            frames += 1
+
+            now = time.time()
+            if now - last_report >= STATS_INTERVAL:
+                events.put(("stats", worker_id, frames, now - last_report, busy, engine.status))
+                frames = 0
+                busy = 0.0
+                last_report = now
+    finally:
+        cap.release()
+
+
+class FleetSupervisor:
+    """Starts one worker per camera and collects their events"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.ctx = mp.get_context("spawn")
+        self.events = self.ctx.Queue(maxsize=1024)
+        self.stop = self.ctx.Event()
+        self.processes = {}
+        self.driver_info = {}
+        self.stats = {}
+
+        from config import load_driver_config
+        for worker_id, spec in enumerate(workers):
+            self.driver_info[worker_id] = load_driver_config(spec["config"])
+
+        # One outbox and one dispatcher per box: alerts from every camera go to the same dashboard
+        urls = {}
+        for worker_id, spec in enumerate(workers):
+            url = self.driver_info[worker_id].get("dashboard_url", DEFAULT_DASHBOARD_URL).rstrip("/")
+            urls.setdefault(url, []).append(spec["config"])
+        if len(urls) > 1:
+            listed = "; ".join(f"{url} ({', '.join(configs)})" for url, configs in urls.items())
+            raise ValueError(f"Worker configs name different dashboard_url values: {listed}. "
+                             "All cameras on one box must report to the same dashboard.")
+        self.dashboard_url = next(iter(urls), None)
+
+        self.alert_store = None
+        self.dispatcher = None
+
+    def start(self):
+        from alert_store import open_store
+        from dispatcher import Dispatcher
+        from outbox import mark_local_source
+
+        self.alert_store = open_store()
+        if self.dashboard_url:
+            self.dispatcher = Dispatcher(self.dashboard_url)
+            mark_local_source(self.alert_store, self.dispatcher.outbox.source)
+            self.dispatcher.start()
+
+        cores = available_cores()
+        for worker_id, spec in enumerate(self.workers):
+            core = cores[worker_id % len(cores)] if spec.get("pin", True) else None
+            process = self.ctx.Process(
+                target=camera_worker,
+                args=(worker_id, spec["camera"], spec["config"], core, self.events, self.stop),
+                name=f"camera-{worker_id}",
+                daemon=True,
+            )
+            process.start()
+            self.processes[worker_id] = process
+            print(f"Worker {worker_id}: camera {spec['camera']} -> core {core} "
+                  f"({self.driver_info[worker_id].get('id')})")
+
+    def handle(self, event):
+        kind, worker_id = event[0], event[1]
+        info = self.driver_info[worker_id]
+        if kind == "alert":
+            _, _, status, duration, wall_time = event
+            alert_data = {
+                "timestamp": datetime.datetime.fromtimestamp(wall_time).strftime("%Y-%m-%d %H:%M:%S"),
+                "driver": info,
+                "status": status,
+                "duration": duration,
+                # Workers have no location provider; the dashboard skips map and area fan-out for null
+                "location": None,
+            }
+            try:
+                self.alert_store.append(alert_data)
+            except Exception as e:
+                print(f"Error logging alert: {e}")
+            if self.dispatcher is not None:
+                self.dispatcher.submit("/alert", alert_data)
+            print(f"Alert from worker {worker_id} ({info.get('id')}): {status}")
+        elif kind == "stats":
+            _, _, frames, interval, busy, status = event
+            self.stats[worker_id] = (frames / interval, 1000 * busy / max(frames, 1), status)
+            self.print_stats()
+        elif kind == "alarm":
+            print(f"Worker {worker_id} ({info.get('id')}): driver asleep, alarm raised")
+        elif kind == "error":
+            print(f"Worker {worker_id} ({info.get('id')}): {event[2]}")
+
+    def print_stats(self):
+        total = sum(fps for fps, _, _ in self.stats.values())
+        parts = [f"#{w} {fps:.1f} FPS {ms:.1f} ms {status or '-'}" for w, (fps, ms, status) in sorted(self.stats.items())]
+        print(f"Fleet: {total:.1f} FPS total | " + " | ".join(parts))
+
+    def run(self):
+        try:
+            while any(p.is_alive() for p in self.processes.values()):
+                try:
+                    self.handle(self.events.get(timeout=1))
+                except queue.Empty:
+                    continue
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.stop.set()
+        for process in self.processes.values():
+            process.join(timeout=3)
+            if process.is_alive():
+                process.terminate()
+        # Drain events that arrived while workers were stopping
+        while True:
+            try:
+                self.handle(self.events.get_nowait())
+            except (queue.Empty, OSError, ValueError):
+                break
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+        print("Fleet stopped.")
+
+
+def load_fleet_config(path):
+    with open(path, "r") as f:
+        config = json.load(f)
+    workers = config.get("workers", [])
+    for spec in workers:
+        camera = spec.get("camera", 0)
+        # Numeric strings are camera indices, anything else a file / stream URL
+        spec["camera"] = int(camera) if str(camera).isdigit() else camera
+        spec.setdefault("config", "driver_config.json")
+    return workers
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "fleet.json"
+    workers = load_fleet_config(path)
+    if not workers:
+        raise SystemExit(f"No workers configured in {path}")
+    try:
+        supervisor = FleetSupervisor(workers)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    supervisor.start()
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import os
+import csv
+import json
+import math
+import time
+import threading
+from collections import OrderedDict
+
+GEOCODE_CACHE_FILE = "geocode_cache.json"
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(latitude, longitude, precision=7):
+    """Standard base-32 geohash; precision 7 cells are about 150 m x 150 m"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 6371000 * 2 * math.asin(math.sqrt(a))
+
+
+class TokenBucket:
+    """Rate limiter: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate=1.0, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class GeocodeCache:
+    """LRU cache of addresses keyed by geohash cell, persisted as JSON"""
+
+    def __init__(self, path=GEOCODE_CACHE_FILE, max_entries=10000, precision=7):
+        self.path = path
+        self.max_entries = max_entries
+        self.precision = precision
+        self.entries = OrderedDict()
+        self._dirty = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def key(self, latitude, longitude):
+        return geohash(latitude, longitude, self.precision)
+
+    def get(self, latitude, longitude):
+        key = self.key(latitude, longitude)
+        with self._lock:
+            address = self.entries.get(key)
+            if address is not None:
+                self.entries.move_to_end(key)
+            return address
+
+    def put(self, latitude, longitude, address):
+        key = self.key(latitude, longitude)
+        with self._lock:
+            self.entries[key] = address
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._dirty += 1
+            dirty = self._dirty
+        # Persist in batches rather than on every new cell
+        if dirty >= 20:
+            self.save()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("precision") == self.precision:
+                self.entries = OrderedDict(data.get("entries", []))
+        except Exception as e:
+            print(f"Ignoring unreadable geocode cache {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"precision": self.precision, "entries": list(self.entries.items())}
+            self._dirty = 0
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving geocode cache: {e}")
+
+
+class OfflineGeocoder:
+    """Nearest-place lookup over a local CSV dataset (latitude, longitude, name).
+
+    Places are bucketed into a grid of `cell_deg` degree cells so a lookup
+    only scans the 3x3 block of cells around the query point.
+    """
+
+    def __init__(self, dataset_path, cell_deg=0.1, max_distance_m=20000):
+        self.cell_deg = cell_deg
+        self.max_distance_m = max_distance_m
+        self.grid = {}
+        with open(dataset_path, "r", newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if not row or row[0].startswith("#"):
+                    continue
+                try:
+                    latitude, longitude, name = float(row[0]), float(row[1]), row[2]
+                except (ValueError, IndexError):
+                    continue  # header or malformed row
+                self.grid.setdefault(self._cell(latitude, longitude), []).append((latitude, longitude, name))
+
+    def _cell(self, latitude, longitude):
+        return int(math.floor(latitude / self.cell_deg)), int(math.floor(longitude / self.cell_deg))
+
+    def reverse(self, latitude, longitude):
+        """Name of the nearest known place within max_distance_m, or None"""
+        row, col = self._cell(latitude, longitude)
+        best = None
+        best_distance = self.max_distance_m
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                for lat, lon, name in self.grid.get((row + d_row, col + d_col), ()):
+                    d = distance_m(latitude, longitude, lat, lon)
+                    if d < best_distance:
+                        best, best_distance = name, d
+        return best
+
+
+class ReverseGeocoder:
+    """Cached, rate-limited reverse geocoding with an optional offline fallback.
+
+    Lookups are skipped while the vehicle has moved less than
+    `min_distance_m` since the last resolved fix, answered from the geohash
+    cache when the cell is known, and only otherwise sent to the online
+    geocoder, at most `rate` requests per second. Concurrent requests for
+    the same cell are coalesced into one online lookup.
+    """
+
+    def __init__(self, online=None, cache=None, offline=None, min_distance_m=25, rate=1.0):
+        self.online = online
+        self.cache = cache
+        self.offline = offline
+        self.min_distance_m = min_distance_m
+        self.bucket = TokenBucket(rate)
+        self.last = None  # (latitude, longitude, address)
+        self._lookup_lock = threading.Lock()
+        self.stats = {"skipped": 0, "cache_hits": 0, "online": 0, "offline": 0, "fallback": 0}
+
+    def address(self, latitude, longitude):
+        if self.last is not None:
+            last_lat, last_lon, last_address = self.last
+            if distance_m(latitude, longitude, last_lat, last_lon) < self.min_distance_m:
+                self.stats["skipped"] += 1
+                return last_address
+
+        address, resolved = self._resolve(latitude, longitude)
+        # Stand-ins after a failed or rate-limited lookup are not reused, so the next fix retries
+        if resolved:
+            self.last = (latitude, longitude, address)
+        return address
+
+    def _resolve(self, latitude, longitude):
+        """(address, resolved); resolved is False for stand-ins that a later lookup may improve"""
+        if self.cache is not None:
+            address = self.cache.get(latitude, longitude)
+            if address is not None:
+                self.stats["cache_hits"] += 1
+                return address, True
+
+        if self.online is not None:
+            with self._lookup_lock:
+                # Another thread may have resolved this cell while we waited
+                if self.cache is not None:
+                    address = self.cache.get(latitude, longitude)
+                    if address is not None:
+                        self.stats["cache_hits"] += 1
+                        return address, True
+                if self.bucket.try_acquire():
+                    try:
+                        location = self.online.reverse(f"{latitude}, {longitude}", exactly_one=True)
+                        if location:
+                            self.stats["online"] += 1
+                            if self.cache is not None:
+                                self.cache.put(latitude, longitude, location.address)
+                            return location.address, True
+                    except Exception as e:
+                        print(f"Error getting address: {e}")
+
+        if self.offline is not None:
+            name = self.offline.reverse(latitude, longitude)
+            if name:
+                self.stats["offline"] += 1
+                # Final when there is no online geocoder to ask later
+                return f"Near {name}", self.online is None
+
+        self.stats["fallback"] += 1
+        return f"Location at {latitude}, {longitude}", False
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.save()
+
+
+def make_reverse_geocoder(config, online=None):
+    """Build the reverse geocoder described by the driver config.
+
+    `online` is the network geocoder (e.g. geopy's Nominatim); it is
+    dropped when `geocoder` is "offline".
+    """
+    if config.get("geocoder", "nominatim") == "offline":
+        online = None
+    offline = None
+    dataset = config.get("offline_geocoder_dataset")
+    if dataset:
+        try:
+            offline = OfflineGeocoder(dataset)
+        except OSError as e:
+            print(f"Offline geocoder disabled: {e}")
+    cache = GeocodeCache(
+        config.get("geocode_cache_file", GEOCODE_CACHE_FILE),
+        config.get("geocode_cache_size", 10000),
+        config.get("geocode_precision", 7),
+    )
+    return ReverseGeocoder(online, cache, offline,
+                           config.get("geocode_min_distance", 25),
+                           config.get("geocode_rate", 1.0))
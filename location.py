@@ -0,0 +1,232 @@
+import sys
+import json
+import time
+import socket
+import threading
+import subprocess
+
+
+class LocationProvider:
+    """Long-lived source of position fixes.
+
+    `start(on_fix)` launches a background thread that calls
+    `on_fix(latitude, longitude)` for every fix; nothing is spawned per
+    update. Subclasses implement `_run()` and use `_emit()`.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.on_fix = None
+        self.last_fix = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, on_fix):
+        self.on_fix = on_fix
+        self._thread = threading.Thread(target=self._run_forever, name=f"location-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _emit(self, latitude, longitude):
+        self.last_fix = (latitude, longitude, time.time())
+        if self.on_fix is not None:
+            try:
+                self.on_fix(latitude, longitude)
+            except Exception as e:
+                print(f"Error handling location fix: {e}")
+
+    def _run_forever(self):
+        # Sources that drop (watcher crash, gpsd restart) are reopened with backoff
+        delay = 1
+        while not self._stopped.is_set():
+            try:
+                self._run()
+                delay = 1
+            except Exception as e:
+                print(f"Location provider '{self.name}' failed: {e}")
+            if self._stopped.wait(delay):
+                break
+            delay = min(delay * 2, 60)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class WindowsLocationProvider(LocationProvider):
+    """Windows Location API via one persistent PowerShell watcher streaming JSON lines"""
+
+    name = "windows"
+
+    def __init__(self, script="./watch_location.ps1", interval_ms=1000):
+        super().__init__()
+        self.script = script
+        self.interval_ms = interval_ms
+        self.process = None
+
+    def _run(self):
+        self.process = subprocess.Popen(
+            ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-File', self.script,
+             str(self.interval_ms)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        try:
+            for line in self.process.stdout:
+                if self._stopped.is_set():
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    continue
+                if data.get("error") is None:
+                    self._emit(data["latitude"], data["longitude"])
+        finally:
+            self.process.kill()
+
+    def stop(self):
+        super().stop()
+        if self.process is not None:
+            self.process.kill()
+
+
+def parse_nmea(sentence):
+    """(latitude, longitude) from an RMC or GGA sentence with a valid fix, else None"""
+    sentence = sentence.strip()
+    if not sentence.startswith("$") or len(sentence) < 7:
+        return None
+    body = sentence[1:].split("*")[0]
+    fields = body.split(",")
+    kind = fields[0][2:]
+    try:
+        if kind == "RMC" and len(fields) > 6 and fields[2] == "A":
+            lat, lat_hemi, lon, lon_hemi = fields[3], fields[4], fields[5], fields[6]
+        elif kind == "GGA" and len(fields) > 6 and fields[6] not in ("", "0"):
+            lat, lat_hemi, lon, lon_hemi = fields[2], fields[3], fields[4], fields[5]
+        else:
+            return None
+        latitude = int(float(lat) / 100) + (float(lat) % 100) / 60
+        longitude = int(float(lon) / 100) + (float(lon) % 100) / 60
+    except ValueError:
+        return None
+    if lat_hemi == "S":
+        latitude = -latitude
+    if lon_hemi == "W":
+        longitude = -longitude
+    return latitude, longitude
+
+
+class NmeaFileProvider(LocationProvider):
+    """NMEA sentences from a serial device or a (growing) log file"""
+
+    name = "nmea"
+
+    def __init__(self, path, follow=True):
+        super().__init__()
+        self.path = path
+        self.follow = follow
+
+    def _run(self):
+        with open(self.path, "r", errors="ignore") as f:
+            while not self._stopped.is_set():
+                line = f.readline()
+                if not line:
+                    if not self.follow:
+                        self._stopped.set()
+                        return
+                    time.sleep(0.2)
+                    continue
+                fix = parse_nmea(line)
+                if fix is not None:
+                    self._emit(*fix)
+
+
+class GpsdProvider(LocationProvider):
+    """Fixes streamed by a gpsd daemon (JSON watch mode)"""
+
+    name = "gpsd"
+
+    def __init__(self, host="127.0.0.1", port=2947):
+        super().__init__()
+        self.host = host
+        self.port = port
+
+    def _run(self):
+        with socket.create_connection((self.host, self.port), timeout=10) as sock:
+            sock.sendall(b'?WATCH={"enable":true,"json":true};\n')
+            sock.settimeout(None)
+            with sock.makefile("r") as stream:
+                for line in stream:
+                    if self._stopped.is_set():
+                        return
+                    try:
+                        report = json.loads(line)
+                    except ValueError:
+                        continue
+                    # mode 2/3 = 2D/3D fix
+                    if report.get("class") == "TPV" and report.get("mode", 0) >= 2 and "lat" in report:
+                        self._emit(report["lat"], report["lon"])
+
+
+class ReplayProvider(LocationProvider):
+    """Replays recorded fixes (list of pairs, JSONL or CSV file) for tests and demos"""
+
+    name = "replay"
+
+    def __init__(self, fixes, interval=1.0, loop=False):
+        super().__init__()
+        self.fixes = self.load(fixes) if isinstance(fixes, str) else list(fixes)
+        self.interval = interval
+        self.loop = loop
+
+    @staticmethod
+    def load(path):
+        fixes = []
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("{"):
+                    data = json.loads(line)
+                    fixes.append((data["latitude"], data["longitude"]))
+                else:
+                    lat, lon = line.split(",")[:2]
+                    fixes.append((float(lat), float(lon)))
+        return fixes
+
+    def _run(self):
+        while not self._stopped.is_set():
+            for latitude, longitude in self.fixes:
+                self._emit(latitude, longitude)
+                if self._stopped.wait(self.interval):
+                    return
+            if not self.loop:
+                self._stopped.set()
+                return
+
+
+def make_location_provider(config):
+    """Build the provider selected by `location_provider` in the driver config"""
+    default = "windows" if sys.platform.startswith("win") else "gpsd"
+    name = config.get("location_provider", default)
+    if name == "windows":
+        return WindowsLocationProvider(config.get("location_script", "./watch_location.ps1"))
+    if name == "gpsd":
+        return GpsdProvider(config.get("gpsd_host", "127.0.0.1"), config.get("gpsd_port", 2947))
+    if name == "nmea":
+        return NmeaFileProvider(config.get("nmea_path", "/dev/ttyUSB0"))
+    if name == "replay":
+        return ReplayProvider(config["location_replay_file"], config.get("location_replay_interval", 1.0),
+                              loop=True)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown location_provider '{name}'")
@@ -0,0 +1,209 @@
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+# Device side: every dashboard post waits here, numbered, until the dashboard acknowledges it
+OUTBOX_DB_FILE = "dashboard_outbox.db"
+# Dashboard side: alert store meta keys for the highest sequence applied per device, and for
+# devices that write their alerts to that same store themselves
+CURSOR_KEY = "ingest_cursor:"
+LOCAL_SOURCE_KEY = "local_source:"
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    path TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    gzip INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS dead_letter (
+    seq INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    path TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    gzip INTEGER NOT NULL DEFAULT 0,
+    failed_at REAL NOT NULL,
+    reason TEXT
+);
+"""
+
+# Paths that may be dropped (oldest first) when the outbox is full; alerts are always kept
+DROPPABLE_PATHS = ("/location_batch", "/location_update")
+
+
+def _connect(path, schema):
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(schema)
+    return conn
+
+
+class Outbox:
+    """Durable, ordered store-and-forward queue of dashboard posts in SQLite.
+
+    Every post gets the next sequence number and stays on disk until
+    `ack(seq)`; `source` is a random id fixed for the lifetime of the
+    database, so the dashboard can key idempotent ingestion on (source, seq).
+    """
+
+    def __init__(self, path=OUTBOX_DB_FILE, max_rows=200000):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = _connect(path, OUTBOX_SCHEMA)
+        self._appends = 0
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        if row is None:
+            self.source = uuid.uuid4().hex
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('source', ?)", (self.source,))
+        else:
+            self.source = row[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def append(self, path, payload, compress=False, created=None):
+        """Store one post; returns its sequence number"""
+        return self.append_many([(path, payload, compress, created)])
+
+    def append_many(self, items):
+        """Store [(path, payload, compress, created)] in one transaction; returns the last sequence number"""
+        rows = [(created or time.time(), path, json.dumps(payload), int(bool(compress)))
+                for path, payload, compress, created in items]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                seq = None
+                for row in rows:
+                    seq = self._conn.execute(
+                        "INSERT INTO outbox (created, path, payload, gzip) VALUES (?, ?, ?, ?)", row).lastrowid
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._appends += len(rows)
+            if self._appends >= 1000:
+                self._appends = 0
+                self._trim()
+        return seq
+
+    def _trim(self):
+        """Drop the oldest location posts beyond max_rows; caller holds the lock"""
+        excess = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] - self.max_rows
+        if excess > 0:
+            placeholders = ",".join("?" * len(DROPPABLE_PATHS))
+            dropped = self._conn.execute(
+                f"DELETE FROM outbox WHERE seq IN (SELECT seq FROM outbox WHERE path IN ({placeholders}) "
+                "ORDER BY seq LIMIT ?)", DROPPABLE_PATHS + (excess,)).rowcount
+            print(f"Dashboard outbox full: dropped {dropped} oldest location posts")
+
+    def peek(self, limit=500, max_bytes=1000000):
+        """Oldest pending posts [(seq, created, path, payload_json, gzip)], at most `limit` / about `max_bytes`"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT seq, created, path, payload, gzip FROM outbox ORDER BY seq LIMIT ?", (limit,))
+            rows = []
+            size = 0
+            for row in cursor:
+                size += len(row[3])
+                if rows and size > max_bytes:
+                    break
+                rows.append(row)
+            return rows
+
+    def ack(self, seq):
+        """Forget every post up to and including `seq`"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM outbox WHERE seq <= ?", (seq,)).rowcount
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def dead_letter(self, seq, reason):
+        """Move one post the dashboard keeps failing on out of the queue, so the posts behind it can drain"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dead_letter (seq, created, path, payload, gzip, failed_at, reason) "
+                    "SELECT seq, created, path, payload, gzip, ?, ? FROM outbox WHERE seq = ?",
+                    (time.time(), reason, seq))
+                self._conn.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def dead_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+    def requeue_dead(self):
+        """Put dead-lettered posts back at the end of the queue (new sequence numbers); returns how many"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                moved = self._conn.execute(
+                    "INSERT INTO outbox (created, path, payload, gzip) "
+                    "SELECT created, path, payload, gzip FROM dead_letter ORDER BY seq").rowcount
+                self._conn.execute("DELETE FROM dead_letter")
+                self._conn.execute("COMMIT")
+                return moved
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class IngestLog:
+    """Highest applied outbox sequence per source, kept in the dashboard's alert store.
+
+    Uploaded alerts are appended in the same transaction that moves the
+    cursor, so each lands in the history and its rollups exactly once.
+    Sources registered with `mark_local_source` already write to this very
+    store, so only their cursor moves.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._local = set()
+
+    def last_seq(self, source):
+        return int(self.store.get_meta(CURSOR_KEY + source, 0))
+
+    def is_local(self, source):
+        if source not in self._local and self.store.get_meta(LOCAL_SOURCE_KEY + source) is not None:
+            self._local.add(source)
+        return source in self._local
+
+    def advance(self, source, seq, alerts=()):
+        """Move the source's cursor to `seq`, storing [(seq, alert)] not applied before; returns alerts stored"""
+        if self.is_local(source):
+            alerts = ()
+        return self.store.append_ingested(CURSOR_KEY + source, seq, alerts)
+
+
+def mark_local_source(store, source):
+    """Record that the outbox `source` logs its alerts to `store` directly, so ingestion must not copy them"""
+    store.set_meta(LOCAL_SOURCE_KEY + source, "1")
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python outbox.py [database] [--requeue]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    box = Outbox(args[0] if args else OUTBOX_DB_FILE)
+    if "--requeue" in sys.argv:
+        print(f"Requeued {box.requeue_dead()} dead-lettered posts")
+    print(f"{box.count()} pending, {box.dead_count()} dead-lettered posts in {box.path}")
+    box.close()
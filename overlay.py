@@ -0,0 +1,107 @@
+import os
+import sys
+from functools import lru_cache
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def display_available():
+    """False on Linux / BSD sessions without X11 or Wayland (services, SSH, containers)"""
+    if sys.platform.startswith(("win", "darwin")):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+@lru_cache(maxsize=512)
+def text_size(text, scale, thickness):
+    """(width, height) of rendered text; status and prompt strings repeat every frame"""
+    return cv2.getTextSize(text, FONT, scale, thickness)[0]
+
+
+@lru_cache(maxsize=64)
+def wrap_text(message, max_width, scale=0.7, thickness=2):
+    """Split `message` into lines no wider than `max_width` pixels (computed once per message)"""
+    lines = []
+    current_line = []
+    for word in message.split():
+        current_line.append(word)
+        if text_size(" ".join(current_line), scale, thickness)[0] > max_width and len(current_line) > 1:
+            lines.append(" ".join(current_line[:-1]))
+            current_line = [word]
+    if current_line:
+        lines.append(" ".join(current_line))
+    return tuple(lines)
+
+
+class FrameBuffers:
+    """Preallocated per-frame outputs (grayscale, mirrored), reused while the frame size is unchanged.
+
+    Each buffer is overwritten by the next call, so keep one FrameBuffers
+    per consuming thread and do not hold on to results across frames.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def _buffer(self, name, shape, dtype):
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self._buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def gray(self, frame):
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._buffer("gray", frame.shape[:2], frame.dtype))
+
+    def mirror(self, frame):
+        return cv2.flip(frame, 1, dst=self._buffer("mirror", frame.shape, frame.dtype))
+
+
+def blend_rect(frame, top_left, bottom_right, color, alpha):
+    """Blend a filled rectangle into `frame` in place, touching only its ROI"""
+    height, width = frame.shape[:2]
+    x0, y0 = max(top_left[0], 0), max(top_left[1], 0)
+    x1, y1 = min(bottom_right[0] + 1, width), min(bottom_right[1] + 1, height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    roi = frame[y0:y1, x0:x1]
+    cv2.addWeighted(roi, 1 - alpha, _solid(y1 - y0, x1 - x0, color, frame.dtype.str), alpha, 0, dst=roi)
+
+
+@lru_cache(maxsize=16)
+def _solid(height, width, color, dtype):
+    patch = np.empty((height, width, 3), dtype=np.dtype(dtype))
+    patch[:] = color
+    return patch
+
+
+def draw_status_overlay(frame, status, color, ears, stats_lines):
+    """Draw status, EAR values and performance figures onto the frame in place"""
+    height, width = frame.shape[:2]
+    y_position = 50
+
+    # Display FPS
+    cv2.putText(frame, stats_lines[0], (10, 30), FONT, 0.7, (0, 255, 0), 2)
+
+    # Per-stage figures (pipeline mode) along the bottom edge
+    for i, line in enumerate(reversed(stats_lines[1:])):
+        cv2.putText(frame, line, (10, height - 10 - 20 * i), FONT, 0.5, (0, 255, 0), 1)
+
+    # Status over a translucent box; only the box itself is blended
+    status_width = text_size(status, 1.2, 3)[0]
+    status_x = (width - status_width) // 2
+    blend_rect(frame, (status_x - 10, y_position - 40), (status_x + status_width + 10, y_position + 10),
+               (0, 0, 0), 0.3)
+    cv2.putText(frame, status, (status_x, y_position), FONT, 1.2, color, 3)
+
+    for smoothed_ear, ear in ears:
+        # Display EAR values
+        y_position += 40
+        ear_text = f"EAR: {smoothed_ear:.2f} (Raw: {ear:.2f})"
+        ear_width = text_size(ear_text, 0.7, 2)[0]
+        ear_x = (width - ear_width) // 2
+
+        # Draw background for EAR value
+        cv2.rectangle(frame, (ear_x - 5, y_position - 25), (ear_x + ear_width + 5, y_position + 5), (0, 0, 0), -1)
+        cv2.putText(frame, ear_text, (ear_x, y_position), FONT, 0.7, (255, 255, 255), 2)
@@ -0,0 +1,223 @@
+import math
+import heapq
+import sqlite3
+import threading
+import numpy as np
+from metrics import histogram
+
+# Per-driver tracks, kept apart from the alert log so it stays small
+PATHS_DB_FILE = "driver_paths.db"
+
+# Points are stored as integer micro-degrees, clustered by (driver, time)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS path_points (
+    driver_id TEXT NOT NULL,
+    t REAL NOT NULL,
+    lat INTEGER NOT NULL,
+    lon INTEGER NOT NULL,
+    PRIMARY KEY (driver_id, t)
+) WITHOUT ROWID;
+"""
+
+WRITE_SECONDS = histogram("path_store_write_seconds", "Time to append one batch of path points")
+
+COORD_SCALE = 1000000
+EARTH_RADIUS = 6371000
+# Ground resolution of a web-mercator map at zoom 0, metres per pixel at the equator
+METERS_PER_PIXEL_Z0 = 156543.03
+
+
+def tolerance_for_zoom(zoom, latitude=0.0, pixels=1.0):
+    """Simplification tolerance (metres) that keeps the error under `pixels` on screen"""
+    return pixels * METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def _project(points):
+    """Local equirectangular projection to metres; fine for tolerance checks along a trip"""
+    lat = points[:, 0]
+    lat0 = math.radians(float(lat.mean()))
+    y = np.radians(lat) * EARTH_RADIUS
+    x = np.radians(points[:, 1]) * EARTH_RADIUS * math.cos(lat0)
+    return np.column_stack((x, y))
+
+
+def douglas_peucker(points, tolerance):
+    """Indices of the points kept by Douglas-Peucker at `tolerance` metres"""
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    xy = _project(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = xy[start], xy[end]
+        segment = b - a
+        inner = xy[start + 1:end]
+        length = math.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            distances = np.abs(segment[0] * (inner[:, 1] - a[1]) - segment[1] * (inner[:, 0] - a[0])) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return np.flatnonzero(keep)
+
+
+def visvalingam(points, tolerance):
+    """Indices kept by Visvalingam-Whyatt: drop points whose triangle area is below tolerance**2"""
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    xy = _project(points)
+    min_area = tolerance * tolerance
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    removed = [False] * n
+
+    def area(i):
+        a, b, c = xy[prev[i]], xy[i], xy[nxt[i]]
+        return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2
+
+    areas = [0.0] * n
+    heap = []
+    for i in range(1, n - 1):
+        areas[i] = area(i)
+        heap.append((areas[i], i))
+    heapq.heapify(heap)
+    while heap:
+        value, i = heapq.heappop(heap)
+        if removed[i] or value != areas[i]:
+            continue  # stale entry
+        if value >= min_area:
+            break
+        removed[i] = True
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+        for j in (p, q):
+            if 0 < j < n - 1:
+                # Keep areas monotonic so a neighbour is never dropped before this point
+                areas[j] = max(area(j), value)
+                heapq.heappush(heap, (areas[j], j))
+    return np.array([i for i in range(n) if not removed[i]])
+
+
+SIMPLIFIERS = {
+    "dp": douglas_peucker,
+    "vw": visvalingam,
+}
+
+
+def encode_polyline(points, precision=5):
+    """Google encoded-polyline string for [(latitude, longitude), ...]"""
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lon = 0
+    for latitude, longitude in points:
+        lat = int(round(latitude * factor))
+        lon = int(round(longitude * factor))
+        for delta in (lat - prev_lat, lon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lon = lat, lon
+    return "".join(chunks)
+
+
+def decode_polyline(encoded, precision=5):
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+class PathStore:
+    """Per-driver GPS tracks in SQLite, served simplified for a map zoom level"""
+
+    def __init__(self, path=PATHS_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def append(self, driver_id, fixes):
+        """Store [(timestamp, latitude, longitude), ...] for one driver in one transaction"""
+        rows = [(driver_id or "", t, int(round(lat * COORD_SCALE)), int(round(lon * COORD_SCALE)))
+                for t, lat, lon in fixes]
+        if not rows:
+            return
+        with self._lock, WRITE_SECONDS.time():
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR IGNORE INTO path_points VALUES (?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def points(self, driver_id, since=None, until=None):
+        """(N, 3) array of [timestamp, latitude, longitude], oldest first"""
+        query = "SELECT t, lat, lon FROM path_points WHERE driver_id = ?"
+        params = [driver_id or ""]
+        if since is not None:
+            query += " AND t >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND t <= ?"
+            params.append(until)
+        query += " ORDER BY t"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        if not rows:
+            return np.empty((0, 3))
+        track = np.array(rows, dtype=np.float64)
+        track[:, 1:] /= COORD_SCALE
+        return track
+
+    def simplified(self, driver_id, zoom=None, since=None, until=None, algorithm="dp"):
+        """(track, raw_count): the track simplified for `zoom` (raw when zoom is None)"""
+        track = self.points(driver_id, since, until)
+        raw_count = len(track)
+        if zoom is not None and raw_count > 2:
+            tolerance = tolerance_for_zoom(zoom, float(track[:, 1].mean()))
+            track = track[SIMPLIFIERS[algorithm](track[:, 1:], tolerance)]
+        return track, raw_count
+
+    def prune(self, older_than):
+        """Delete points older than the `older_than` epoch timestamp; returns the row count"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM path_points WHERE t < ?", (older_than,)).rowcount
+
+    def drivers(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT driver_id FROM path_points")]
@@ -0,0 +1,194 @@
+import time
+import threading
+from collections import deque
+
+
+class LatestSlot:
+    """Single-slot hand-off between stages that always keeps the freshest item"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._has_item = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._has_item:
+                # The consumer has not caught up; the stale item is discarded
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Take the current item, waiting up to `timeout` seconds; None on timeout"""
+        with self._cond:
+            if not self._has_item:
+                self._cond.wait(timeout)
+                if not self._has_item:
+                    return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+
+class StageStats:
+    """Rolling throughput and latency figures for one pipeline stage"""
+
+    def __init__(self, name, window=60):
+        self.name = name
+        self._lock = threading.Lock()
+        self._ticks = deque(maxlen=window)
+        self._durations = deque(maxlen=window)
+
+    def record(self, duration):
+        with self._lock:
+            self._ticks.append(time.perf_counter())
+            self._durations.append(duration)
+
+    @property
+    def fps(self):
+        with self._lock:
+            if len(self._ticks) < 2:
+                return 0.0
+            span = self._ticks[-1] - self._ticks[0]
+            return (len(self._ticks) - 1) / span if span > 0 else 0.0
+
+    @property
+    def mean_ms(self):
+        with self._lock:
+            if not self._durations:
+                return 0.0
+            return 1000.0 * sum(self._durations) / len(self._durations)
+
+    def summary(self):
+        return f"{self.name}: {self.fps:.1f} FPS ({self.mean_ms:.1f} ms)"
+
+
+class Packet:
+    """A frame travelling through the pipeline together with its timings"""
+
+    __slots__ = ("seq", "frame", "captured_at", "result")
+
+    def __init__(self, seq, frame, captured_at):
+        self.seq = seq
+        self.frame = frame
+        self.captured_at = captured_at
+        self.result = None
+
+
+class CaptureThread(threading.Thread):
+    """Reads the camera continuously so the freshest frame is always available"""
+
+    def __init__(self, cap, out_slot, stats):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.out_slot = out_slot
+        self.stats = stats
+        self.stopped = threading.Event()
+        self.ended = threading.Event()
+
+    def run(self):
+        seq = 0
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                self.ended.set()
+                break
+            self.stats.record(time.perf_counter() - start)
+            self.out_slot.put(Packet(seq, frame, time.time()))
+            seq += 1
+
+
+class InferenceThread(threading.Thread):
+    """Runs `analyze(packet)` on the freshest captured frame.
+
+    An exception from `analyze` is kept in `error` and stops the pipeline,
+    so `Pipeline.run` can re-raise it on the main thread.
+    """
+
+    def __init__(self, analyze, in_slot, out_slot, stats, stopped):
+        super().__init__(name="inference", daemon=True)
+        self.analyze = analyze
+        self.in_slot = in_slot
+        self.out_slot = out_slot
+        self.stats = stats
+        self.stopped = stopped
+        self.error = None
+
+    def run(self):
+        while not self.stopped.is_set():
+            packet = self.in_slot.get(timeout=0.1)
+            if packet is None:
+                continue
+            start = time.perf_counter()
+            try:
+                packet.result = self.analyze(packet)
+            except Exception as e:
+                self.error = e
+                self.stopped.set()
+                break
+            self.stats.record(time.perf_counter() - start)
+            self.out_slot.put(packet)
+
+
+class Pipeline:
+    """Capture -> inference -> render, each stage running at its own rate.
+
+    Stages are connected by single-slot queues, so a slow stage drops stale
+    frames instead of building up latency. `render(packet, pipeline)` runs
+    on the calling thread (HighGUI windows must stay on the main thread)
+    and returns False to stop. An exception raised by `analyze` on the
+    inference thread ends the run and is re-raised from `run`.
+    """
+
+    def __init__(self, cap, analyze, render):
+        self.capture_stats = StageStats("capture")
+        self.inference_stats = StageStats("inference")
+        self.render_stats = StageStats("render")
+        self.captured = LatestSlot()
+        self.analyzed = LatestSlot()
+        self.capture = CaptureThread(cap, self.captured, self.capture_stats)
+        self.inference = InferenceThread(analyze, self.captured, self.analyzed,
+                                         self.inference_stats, self.capture.stopped)
+        self.render = render
+        self.last_latency = 0.0  # seconds from capture to display
+
+    @property
+    def stages(self):
+        return (self.capture_stats, self.inference_stats, self.render_stats)
+
+    @property
+    def dropped(self):
+        return self.captured.dropped + self.analyzed.dropped
+
+    def run(self):
+        self.capture.start()
+        self.inference.start()
+        try:
+            while True:
+                if self.inference.error is not None:
+                    break
+                packet = self.analyzed.get(timeout=0.1)
+                if packet is None:
+                    if self.capture.ended.is_set():
+                        break
+                    continue
+                start = time.perf_counter()
+                keep_going = self.render(packet, self)
+                self.render_stats.record(time.perf_counter() - start)
+                self.last_latency = time.time() - packet.captured_at
+                if keep_going is False:
+                    break
+        finally:
+            self.stop()
+        if self.inference.error is not None:
+            raise self.inference.error
+
+    def stop(self):
+        self.capture.stopped.set()
+        self.capture.join(1)
+        self.inference.join(1)
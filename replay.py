@@ -0,0 +1,159 @@
+"""Headless replay of recorded clips through the detection engine.
+
+Reads a video file or a directory of frames as fast as possible (no camera,
+no display) and writes per-frame EAR / state records plus state-change and
+alert events as JSON lines.
+
+Usage:
+    python replay.py clip.mp4 --out events.jsonl --profile calibration_profiles/DRV12345.json
+    python replay.py frames_dir/ --fps 15 --awake 0.30 --drowsy 0.22 --sleep 0.12
+    python replay.py clip.mp4 --profile calibration_profiles/DRV12345.json --trace ear_traces/clip
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+from driver2 import DrowsinessEngine, load_driver_config, CONFIG_FILE
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def iter_frames(source, fps=None):
+    """Yield (index, timestamp, frame) from a video file or a directory of images.
+
+    Timestamps are in seconds on the clip's own clock: the container's frame
+    rate for videos (unless `fps` overrides it), `fps` (default 30) for
+    image directories.
+    """
+    if os.path.isdir(source):
+        fps = fps or 30.0
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTENSIONS))
+        for index, name in enumerate(names):
+            frame = cv2.imread(os.path.join(source, name))
+            if frame is None:
+                print(f"Skipping unreadable frame {name}", file=sys.stderr)
+                continue
+            yield index, index / fps, frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open video '{source}'")
+    fps = fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, index / fps, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+class ReplayEngine(DrowsinessEngine):
+    """Engine variant that records alerts as events instead of storing / posting them"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = []
+
+    def play_alarm(self):
+        pass
+
+    def log_alert(self, status, duration):
+        self.events.append({"event": "alert", "status": status, "duration": round(duration, 3)})
+
+
+def make_engine(profile, driver_info=None):
+    engine = ReplayEngine(driver_info=driver_info)
+    engine.set_profile(profile)
+    return engine
+
+
+def replay(engine, source, out=None, fps=None, max_frames=None):
+    """Run every frame of `source` through `engine`; returns per-frame timing records.
+
+    `source` is a path understood by iter_frames or an iterable of
+    (index, timestamp, frame) tuples.
+    """
+    frames = iter_frames(source, fps) if isinstance(source, str) else source
+    timings = []
+    last_status = engine.status
+    for index, timestamp, frame in frames:
+        if max_frames is not None and index >= max_frames:
+            break
+        start = time.perf_counter()
+        # Headless: no mirror flip, straight to the engine's reused grayscale buffer
+        gray = engine.analysis_buffers.gray(frame)
+        ears = engine.analyze_gray(gray, timestamp, time.time())
+        total = time.perf_counter() - start
+
+        stage_times = dict(engine.stage_times, total=total)
+        timings.append(stage_times)
+
+        if out is not None:
+            record = {
+                "frame": index,
+                "t": round(timestamp, 4),
+                "faces": len(ears),
+                "status": engine.status,
+                "ear": [round(raw, 4) for _, raw in ears],
+                "smoothed": [round(smoothed, 4) for smoothed, _ in ears],
+            }
+            out.write(json.dumps(record) + "\n")
+            if engine.status != last_status:
+                out.write(json.dumps({"event": "state", "frame": index, "t": round(timestamp, 4),
+                                      "from": last_status, "to": engine.status}) + "\n")
+            for event in engine.events:
+                out.write(json.dumps(dict(event, frame=index, t=round(timestamp, 4))) + "\n")
+        engine.events.clear()
+        last_status = engine.status
+    return timings
+
+
+def load_thresholds(args):
+    if args.profile:
+        with open(args.profile, "r") as f:
+            return json.load(f)
+    if None in (args.awake, args.drowsy, args.sleep):
+        raise SystemExit("Pass --profile or all of --awake, --drowsy and --sleep")
+    return {"awake_ear": args.awake, "drowsy_ear": args.drowsy, "sleep_ear": args.sleep}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless replay of a clip through the drowsiness engine")
+    parser.add_argument("source", help="video file or directory of frames")
+    parser.add_argument("--out", help="JSONL output file (default: stdout)")
+    parser.add_argument("--profile", help="calibration profile JSON with awake/drowsy/sleep EAR")
+    parser.add_argument("--awake", type=float)
+    parser.add_argument("--drowsy", type=float)
+    parser.add_argument("--sleep", type=float)
+    parser.add_argument("--fps", type=float, help="override the clip frame rate")
+    parser.add_argument("--config", default=CONFIG_FILE, help="driver config with detection settings")
+    parser.add_argument("--trace", help="also record the EAR trace to TRACE.npy for tune.py")
+    args = parser.parse_args()
+
+    engine = make_engine(load_thresholds(args), load_driver_config(args.config))
+    if args.trace:
+        engine.start_trace(args.trace)
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        start = time.perf_counter()
+        timings = replay(engine, args.source, out, args.fps)
+        elapsed = time.perf_counter() - start
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if engine.trace is not None:
+            engine.trace.close()
+    if timings:
+        print(f"Replayed {len(timings)} frames in {elapsed:.2f} s ({len(timings) / elapsed:.1f} FPS)",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import math
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-size NumPy ring buffer with a running sum"""
+
+    # Re-sum from scratch this often to stop floating point drift accumulating
+    RESUM_EVERY = 10000
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError(f"ring buffer size must be positive, got {size}")
+        self.data = np.zeros(size, dtype=np.float64)
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+        self._pushes = 0
+
+    def push(self, value):
+        if self.count == len(self.data):
+            self.total -= self.data[self.index]
+        else:
+            self.count += 1
+        self.data[self.index] = value
+        self.total += value
+        self.index = (self.index + 1) % len(self.data)
+
+        self._pushes += 1
+        if self._pushes % self.RESUM_EVERY == 0:
+            self.total = float(self.values().sum())
+
+    def values(self):
+        """View of the filled part of the buffer (in storage order)"""
+        return self.data[:self.count]
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+
+
+class MovingAverageFilter:
+    """Simple moving average in O(1) per sample"""
+
+    def __init__(self, window=5):
+        self.buffer = RingBuffer(window)
+
+    def update(self, value, timestamp=None):
+        self.buffer.push(value)
+        return self.buffer.mean()
+
+    def reset(self):
+        self.buffer.clear()
+
+
+class EmaFilter:
+    """Exponential moving average"""
+
+    def __init__(self, alpha=0.4):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, value, timestamp=None):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def reset(self):
+        self.value = None
+
+
+class MedianFilter:
+    """Moving median, robust against single-frame blinks and landmark glitches"""
+
+    def __init__(self, window=5):
+        self.buffer = RingBuffer(window)
+
+    def update(self, value, timestamp=None):
+        self.buffer.push(value)
+        return float(np.median(self.buffer.values()))
+
+    def reset(self):
+        self.buffer.clear()
+
+
+class OneEuroFilter:
+    """One-euro filter: little smoothing when the EAR moves fast, more when it is steady"""
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, value, timestamp=None):
+        if self.value is None or timestamp is None or self.timestamp is None:
+            self.value = value
+            self.derivative = 0.0
+            self.timestamp = timestamp
+            return value
+
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return self.value
+        self.timestamp = timestamp
+
+        a_d = self._alpha(self.d_cutoff, dt)
+        self.derivative += a_d * ((value - self.value) / dt - self.derivative)
+        cutoff = self.min_cutoff + self.beta * abs(self.derivative)
+        self.value += self._alpha(cutoff, dt) * (value - self.value)
+        return self.value
+
+    def reset(self):
+        self.value = None
+        self.derivative = 0.0
+        self.timestamp = None
+
+
+FILTERS = {
+    "moving_average": MovingAverageFilter,
+    "ema": EmaFilter,
+    "median": MedianFilter,
+    "one_euro": OneEuroFilter,
+}
+
+
+def _positive(config, key, default, cast=float):
+    value = config.get(key, default)
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a number, got {value!r}")
+    if not value > 0:
+        raise ValueError(f"{key} must be positive, got {value}")
+    return value
+
+
+def make_smoother(config):
+    """Build the EAR filter selected by `ear_filter` in the driver config; ValueError on a bad config"""
+    name = config.get("ear_filter", "moving_average")
+    if name in ("moving_average", "median"):
+        return FILTERS[name](_positive(config, "ear_filter_window", 5, int))
+    if name == "ema":
+        alpha = _positive(config, "ear_filter_alpha", 0.4)
+        if alpha > 1:
+            raise ValueError(f"ear_filter_alpha must be at most 1, got {alpha}")
+        return EmaFilter(alpha)
+    if name == "one_euro":
+        beta = config.get("one_euro_beta", 0.05)
+        if not isinstance(beta, (int, float)) or beta < 0:
+            raise ValueError(f"one_euro_beta must be a non-negative number, got {beta!r}")
+        return OneEuroFilter(_positive(config, "one_euro_min_cutoff", 1.0), beta)
+    raise ValueError(f"Unknown ear_filter '{name}', expected one of: {', '.join(FILTERS)}")
+
+
+class FaceSmoothers:
+    """One EAR filter per face slot so faces in the same frame don't mix.
+
+    The config is validated on construction, so a bad `ear_filter` fails at
+    startup rather than on the first face. A slot's filter survives up to
+    `ear_filter_grace_frames` consecutive frames without that face, so a
+    single missed detection does not throw its smoothing history away.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.grace_frames = int(config.get("ear_filter_grace_frames", 15))
+        self.filters = [make_smoother(config)]
+        self.missed = [0]
+
+    def update(self, slot, value, timestamp=None):
+        while len(self.filters) <= slot:
+            self.filters.append(make_smoother(self.config))
+            self.missed.append(0)
+        self.missed[slot] = 0
+        return self.filters[slot].update(value, timestamp)
+
+    def retain(self, count):
+        """Note that only `count` faces were seen; drop filters of faces gone longer than the grace period"""
+        for slot in range(count, len(self.filters)):
+            self.missed[slot] += 1
+        while len(self.filters) > count and self.missed[-1] > self.grace_frames:
+            self.filters.pop()
+            self.missed.pop()
@@ -0,0 +1,236 @@
+from collections import namedtuple
+import numpy as np
+
+ACTIVE = "Active :)"
+DROWSY = "Drowsy !"
+SLEEPING = "SLEEPING !!!"
+# Status codes used by the vectorized pass; -1 means no state confirmed yet
+STATUSES = (ACTIVE, DROWSY, SLEEPING)
+STATUS_COLORS = {ACTIVE: (0, 255, 0), DROWSY: (0, 255, 255), SLEEPING: (0, 0, 255)}
+
+# Consecutive samples in a zone before the state changes
+STATE_CHANGE_FRAMES = 3
+# Zone limits relative to the calibrated EARs (slightly lenient both ways)
+AWAKE_MARGIN = 0.85
+SLEEP_MARGIN = 1.1
+
+# Event kinds
+STATE = "state"  # status changed
+ALARM = "alarm"  # entered Sleeping; sound the alarm once
+ALERT = "alert"  # Drowsy / Sleeping lasted past its alert threshold
+
+Event = namedtuple("Event", "kind timestamp status duration index", defaults=(None, None))
+
+_NO_EVENTS = ()
+
+
+class DriverState:
+    """Active / Drowsy / Sleeping state machine for one driver.
+
+    `update(timestamp, ear)` consumes one smoothed EAR sample and returns
+    the events it caused; `run(timestamps, ears)` consumes a whole series
+    in one vectorized pass with the same results and leaves the machine in
+    the same state, so live and replayed traces can be mixed freely. NaN
+    samples (no face) leave the state untouched.
+    """
+
+    __slots__ = ("awake_ear", "sleep_ear", "drowsy_alert_threshold", "sleep_alert_threshold", "change_frames",
+                 "awake_margin", "sleep_margin", "awake_limit", "sleep_limit", "active", "drowsy", "sleep", "status",
+                 "drowsy_start", "sleep_start", "drowsy_alert_sent", "sleep_alert_sent", "alarm_played")
+
+    def __init__(self, awake_ear=None, sleep_ear=None, drowsy_alert_threshold=7, sleep_alert_threshold=5,
+                 change_frames=STATE_CHANGE_FRAMES, awake_margin=AWAKE_MARGIN, sleep_margin=SLEEP_MARGIN):
+        self.awake_margin = awake_margin
+        self.sleep_margin = sleep_margin
+        self.drowsy_alert_threshold = drowsy_alert_threshold
+        self.sleep_alert_threshold = sleep_alert_threshold
+        self.change_frames = change_frames
+        self.awake_ear = self.sleep_ear = self.awake_limit = self.sleep_limit = None
+        if awake_ear is not None and sleep_ear is not None:
+            self.set_thresholds(awake_ear, sleep_ear)
+        self.reset()
+
+    def set_thresholds(self, awake_ear, sleep_ear):
+        self.awake_ear = awake_ear
+        self.sleep_ear = sleep_ear
+        self.awake_limit = awake_ear * self.awake_margin
+        self.sleep_limit = sleep_ear * self.sleep_margin
+
+    def reset(self):
+        self.active = self.drowsy = self.sleep = 0
+        self.status = ""
+        self.drowsy_start = self.sleep_start = None
+        self.drowsy_alert_sent = self.sleep_alert_sent = self.alarm_played = False
+
+    @property
+    def active_confirmed(self):
+        """True while the last sample kept the driver confirmed Active"""
+        return self.active >= self.change_frames
+
+    def update(self, timestamp, ear):
+        """Advance by one smoothed EAR sample; returns a (usually empty) sequence of events"""
+        events = _NO_EVENTS
+        if ear >= self.awake_limit:
+            self.sleep = self.drowsy = 0
+            if self.active < self.change_frames:
+                self.active += 1
+            if self.active >= self.change_frames:
+                if self.status != ACTIVE:
+                    self.status = ACTIVE
+                    events = [Event(STATE, timestamp, ACTIVE)]
+                self.alarm_played = False
+                self.sleep_start = self.drowsy_start = None
+                self.sleep_alert_sent = self.drowsy_alert_sent = False
+        elif ear > self.sleep_limit:
+            self.sleep = self.active = 0
+            if self.drowsy < self.change_frames:
+                self.drowsy += 1
+            if self.drowsy >= self.change_frames:
+                if self.status != DROWSY:
+                    self.status = DROWSY
+                    events = [Event(STATE, timestamp, DROWSY)]
+                # The timer starts once on entering Drowsy and runs until the driver is Active again
+                if self.drowsy_start is None:
+                    self.drowsy_start = timestamp
+                elif timestamp - self.drowsy_start > self.drowsy_alert_threshold and not self.drowsy_alert_sent:
+                    self.drowsy_alert_sent = True
+                    events = list(events) + [Event(ALERT, timestamp, DROWSY, timestamp - self.drowsy_start)]
+        elif ear <= self.sleep_limit:
+            self.active = self.drowsy = 0
+            if self.sleep < self.change_frames:
+                self.sleep += 1
+            if self.sleep >= self.change_frames:
+                if self.status != SLEEPING:
+                    self.status = SLEEPING
+                    events = [Event(STATE, timestamp, SLEEPING)]
+                if not self.alarm_played:
+                    self.alarm_played = True
+                    events = list(events) + [Event(ALARM, timestamp, SLEEPING)]
+                if self.sleep_start is None:
+                    self.sleep_start = timestamp
+                elif timestamp - self.sleep_start > self.sleep_alert_threshold and not self.sleep_alert_sent:
+                    self.sleep_alert_sent = True
+                    events = list(events) + [Event(ALERT, timestamp, SLEEPING, timestamp - self.sleep_start)]
+        return events
+
+    def run(self, timestamps, ears):
+        """Advance by a whole series in one vectorized pass.
+
+        Returns (codes, events): the status code (index into STATUSES, -1
+        before any state is confirmed) after every sample, and the events
+        in order with `index` set to the sample that caused them.
+        """
+        t_all = np.asarray(timestamps, dtype=np.float64)
+        e_all = np.asarray(ears, dtype=np.float64)
+        initial = STATUSES.index(self.status) if self.status in STATUSES else -1
+        valid = np.flatnonzero(~np.isnan(e_all))
+        if not len(valid):
+            return np.full(len(e_all), initial, dtype=np.int8), []
+        t = t_all[valid]
+        ear = e_all[valid]
+        n = len(ear)
+        positions = np.arange(n)
+
+        # Zone of each sample, then its position in the run of equal zones
+        zone = np.where(ear >= self.awake_limit, 0, np.where(ear > self.sleep_limit, 1, 2))
+        run_start = np.empty(n, dtype=bool)
+        run_start[0] = True
+        np.not_equal(zone[1:], zone[:-1], out=run_start[1:])
+        starts = np.flatnonzero(run_start)
+        run_length = positions - starts[np.cumsum(run_start) - 1] + 1
+        # The first run continues whatever count the machine already had in that zone
+        first_run_end = starts[1] if len(starts) > 1 else n
+        run_length[:first_run_end] += (self.active, self.drowsy, self.sleep)[zone[0]]
+        confirmed = run_length >= self.change_frames
+
+        # Status after each sample: the zone of the latest confirmed sample
+        latest = np.maximum.accumulate(np.where(confirmed, positions, -1))
+        status = np.where(latest >= 0, zone[np.maximum(latest, 0)], initial)
+        previous = np.empty(n, dtype=status.dtype)
+        previous[0] = initial
+        previous[1:] = status[:-1]
+        changed = np.flatnonzero(status != previous)
+
+        # A confirmed Active sample resets every timer and flag; "epochs" lie between resets
+        epoch = np.cumsum(confirmed & (zone == 0))
+        final_epoch = epoch[-1]
+
+        drowsy_alerts, drowsy_durations, self.drowsy_start, self.drowsy_alert_sent = self._timer_alerts(
+            np.flatnonzero(confirmed & (zone == 1)), epoch, t, final_epoch,
+            self.drowsy_start, self.drowsy_alert_sent, self.drowsy_alert_threshold)
+        sleep_alerts, sleep_durations, self.sleep_start, self.sleep_alert_sent = self._timer_alerts(
+            np.flatnonzero(confirmed & (zone == 2)), epoch, t, final_epoch,
+            self.sleep_start, self.sleep_alert_sent, self.sleep_alert_threshold)
+
+        # The alarm sounds at the first confirmed Sleeping sample of each epoch
+        sleeping = np.flatnonzero(confirmed & (zone == 2))
+        sleep_epochs = epoch[sleeping]
+        first = np.ones(len(sleeping), dtype=bool)
+        first[1:] = sleep_epochs[1:] != sleep_epochs[:-1]
+        alarms = sleeping[first & ((sleep_epochs != 0) | (not self.alarm_played))]
+        if final_epoch > 0:
+            self.alarm_played = bool(len(sleeping)) and bool(sleep_epochs[-1] == final_epoch)
+        else:
+            self.alarm_played = self.alarm_played or bool(len(sleeping))
+
+        # Leave the counters where the scalar path would have left them
+        counters = [0, 0, 0]
+        counters[zone[-1]] = min(int(run_length[-1]), self.change_frames)
+        self.active, self.drowsy, self.sleep = counters
+        self.status = STATUSES[status[-1]] if status[-1] >= 0 else self.status
+
+        # Same-sample events keep the scalar order: state, alarm, alert
+        events = [(i, 0, STATE, STATUSES[status[i]], None) for i in changed]
+        events += [(i, 1, ALARM, SLEEPING, None) for i in alarms]
+        events += [(i, 2, ALERT, DROWSY, d) for i, d in zip(drowsy_alerts, drowsy_durations)]
+        events += [(i, 2, ALERT, SLEEPING, d) for i, d in zip(sleep_alerts, sleep_durations)]
+        events.sort(key=lambda event: event[:2])
+        events = [Event(kind, float(t[i]), name, None if d is None else float(d), int(valid[i]))
+                  for i, _, kind, name, d in events]
+
+        # Expand statuses back over the NaN samples, which keep the preceding status
+        codes = np.full(len(e_all), initial, dtype=np.int8)
+        codes[valid] = status
+        last_valid = np.maximum.accumulate(np.where(~np.isnan(e_all), np.arange(len(e_all)), -1))
+        codes = np.where(last_valid >= 0, codes[np.maximum(last_valid, 0)], initial).astype(np.int8)
+        return codes, events
+
+    @staticmethod
+    def _timer_alerts(samples, epoch, t, final_epoch, start, sent, threshold):
+        """Alert samples and durations for one timer, plus its (start, sent) state at the end"""
+        empty = np.empty(0, dtype=np.int64)
+        if not len(samples):
+            if final_epoch > 0:
+                return empty, empty, None, False
+            return empty, empty, start, sent
+        epochs = epoch[samples]
+        group_first = np.ones(len(samples), dtype=bool)
+        group_first[1:] = epochs[1:] != epochs[:-1]
+        group = np.cumsum(group_first) - 1
+        group_epochs = epochs[group_first]
+        starts = t[samples[group_first]]
+        carried = (group_epochs == 0) & (start is not None)
+        if start is not None:
+            starts[group_epochs == 0] = start
+
+        elapsed = t[samples] - starts[group]
+        # The sample that starts a timer never fires it; one alert per epoch at most
+        fire = (elapsed > threshold) & ~(group_first & ~carried[group])
+        if sent:
+            fire &= epochs != 0
+        fired = np.flatnonzero(fire)
+        fired_groups = group[fired]
+        keep = np.ones(len(fired), dtype=bool)
+        keep[1:] = fired_groups[1:] != fired_groups[:-1]
+        fired, fired_groups = fired[keep], fired_groups[keep]
+
+        if group_epochs[-1] == final_epoch:
+            last_group = len(group_epochs) - 1
+            end_start = float(starts[last_group])
+            end_sent = bool(len(fired_groups)) and bool(fired_groups[-1] == last_group)
+            end_sent = end_sent or (final_epoch == 0 and sent)
+        elif final_epoch > 0:
+            end_start, end_sent = None, False
+        else:
+            end_start, end_sent = start, sent
+        return samples[fired], elapsed[fired], end_start, end_sent
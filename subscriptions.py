@@ -0,0 +1,144 @@
+import math
+import threading
+
+# Clients that have not subscribed to anything watch the whole fleet
+FLEET_ROOM = "fleet"
+
+# Two grid levels of map-cell rooms: fine cells for street / city views, coarse for regions
+FINE_CELL_DEG = 0.1
+COARSE_CELL_DEG = 2.0
+MAX_FINE_CELLS = 64
+MAX_COARSE_CELLS = 256
+MAX_IDS = 500
+
+
+def _cell(latitude, longitude, size):
+    return int(math.floor(latitude / size)), int(math.floor(longitude / size))
+
+
+def cell_rooms(latitude, longitude):
+    """Rooms of the fine and coarse grid cells containing a position"""
+    fine = _cell(latitude, longitude, FINE_CELL_DEG)
+    coarse = _cell(latitude, longitude, COARSE_CELL_DEG)
+    return [f"fine:{fine[0]}:{fine[1]}", f"coarse:{coarse[0]}:{coarse[1]}"]
+
+
+def parse_bbox(bbox):
+    """Validate [south, west, north, east] in degrees; west > east crosses the antimeridian"""
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        raise ValueError("bbox must be [south, west, north, east]")
+    south, west, north, east = (float(v) for v in bbox)
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError("bbox out of range")
+    return south, west, north, east
+
+
+def in_bbox(bbox, latitude, longitude):
+    south, west, north, east = bbox
+    if not south <= latitude <= north:
+        return False
+    if west <= east:
+        return west <= longitude <= east
+    return longitude >= west or longitude <= east
+
+
+def _cells_in_bbox(bbox, size, limit):
+    """Grid cells covering bbox, or None when there are more than `limit`"""
+    south, west, north, east = bbox
+    row_min, col_min = _cell(south, west, size)
+    row_max, col_max = _cell(north, east, size)
+    if west <= east:
+        col_ranges = [(col_min, col_max)]
+    else:
+        col_ranges = [(col_min, _cell(0, 180, size)[1]), (_cell(0, -180, size)[1], col_max)]
+    rows = row_max - row_min + 1
+    cols = sum(hi - lo + 1 for lo, hi in col_ranges)
+    if rows * cols > limit:
+        return None
+    return [(row, col) for row in range(row_min, row_max + 1)
+            for lo, hi in col_ranges for col in range(lo, hi + 1)]
+
+
+def viewport_rooms(bbox):
+    """Cell rooms covering a viewport: fine cells when few enough, else coarse, else the fleet room"""
+    cells = _cells_in_bbox(bbox, FINE_CELL_DEG, MAX_FINE_CELLS)
+    if cells is not None:
+        return [f"fine:{row}:{col}" for row, col in cells]
+    cells = _cells_in_bbox(bbox, COARSE_CELL_DEG, MAX_COARSE_CELLS)
+    if cells is not None:
+        return [f"coarse:{row}:{col}" for row, col in cells]
+    return [FLEET_ROOM]
+
+
+def subscription_rooms(request):
+    """Rooms for a subscribe request {"drivers": [...], "vehicles": [...], "bbox": [s, w, n, e]}.
+
+    Filters are alternatives: an event is delivered if it matches any of
+    them. An empty request means the whole fleet.
+    """
+    request = request or {}
+    drivers = request.get("drivers") or []
+    vehicles = request.get("vehicles") or []
+    if not isinstance(drivers, list) or not isinstance(vehicles, list):
+        raise ValueError("drivers and vehicles must be lists")
+    if len(drivers) + len(vehicles) > MAX_IDS:
+        raise ValueError(f"At most {MAX_IDS} drivers and vehicles per subscription")
+    rooms = [f"driver:{d}" for d in drivers] + [f"vehicle:{v}" for v in vehicles]
+    if request.get("bbox") is not None:
+        rooms += viewport_rooms(parse_bbox(request["bbox"]))
+    if not rooms or FLEET_ROOM in rooms:
+        return [FLEET_ROOM]
+    return rooms
+
+
+def event_rooms(driver_id=None, vehicle=None, latitude=None, longitude=None):
+    """Every room an event about this driver / vehicle / position should reach"""
+    return [FLEET_ROOM] + filter_rooms(driver_id, vehicle, latitude, longitude)
+
+
+def filter_rooms(driver_id=None, vehicle=None, latitude=None, longitude=None):
+    """Subscription rooms matching an event, without the whole-fleet room"""
+    rooms = []
+    if driver_id:
+        rooms.append(f"driver:{driver_id}")
+    if vehicle:
+        rooms.append(f"vehicle:{vehicle}")
+    if latitude is not None and longitude is not None:
+        rooms += cell_rooms(latitude, longitude)
+    return rooms
+
+
+class PositionIndex:
+    """Latest position per driver in a fine grid, for "who is inside this viewport" queries"""
+
+    def __init__(self, cell_deg=FINE_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.positions = {}  # driver_id -> (latitude, longitude, payload)
+        self.cells = {}      # cell -> set of driver ids
+        self._lock = threading.Lock()
+
+    def update(self, driver_id, latitude, longitude, payload):
+        cell = _cell(latitude, longitude, self.cell_deg)
+        with self._lock:
+            previous = self.positions.get(driver_id)
+            if previous is not None:
+                old_cell = _cell(previous[0], previous[1], self.cell_deg)
+                if old_cell != cell:
+                    members = self.cells.get(old_cell)
+                    members.discard(driver_id)
+                    if not members:
+                        del self.cells[old_cell]
+            self.cells.setdefault(cell, set()).add(driver_id)
+            self.positions[driver_id] = (latitude, longitude, payload)
+
+    def within(self, bbox):
+        """{driver_id: payload} for drivers currently inside bbox"""
+        cells = _cells_in_bbox(bbox, self.cell_deg, max(len(self.cells), 1) * 4)
+        with self._lock:
+            if cells is None:
+                # Viewport larger than the occupied grid: scanning the drivers is cheaper
+                candidates = self.positions.keys()
+            else:
+                candidates = set().union(*(self.cells.get(cell, ()) for cell in cells)) if cells else ()
+            return {driver_id: self.positions[driver_id][2] for driver_id in candidates
+                    if in_bbox(bbox, *self.positions[driver_id][:2])}
@@ -0,0 +1,130 @@
+import time
+import threading
+
+# Coordinates travel as integer micro-degrees (~0.1 m), times as integer milliseconds
+COORD_SCALE = 1000000
+BATCH_VERSION = 1
+
+
+def encode_fixes(fixes, driver_id=None, address=None, vehicle=None):
+    """Delta-encode [(timestamp, latitude, longitude), ...] into a compact batch.
+
+    The first fix is stored absolutely, every later one as the difference
+    from its predecessor, so a slow-moving vehicle produces runs of small
+    integers that compress well.
+    """
+    dt, dlat, dlon = [], [], []
+    prev_t = prev_lat = prev_lon = None
+    for timestamp, latitude, longitude in fixes:
+        t = int(round(timestamp * 1000))
+        lat = int(round(latitude * COORD_SCALE))
+        lon = int(round(longitude * COORD_SCALE))
+        if prev_t is None:
+            t0, lat0, lon0 = t, lat, lon
+            prev_t, prev_lat, prev_lon = t, lat, lon
+        dt.append(t - prev_t)
+        dlat.append(lat - prev_lat)
+        dlon.append(lon - prev_lon)
+        prev_t, prev_lat, prev_lon = t, lat, lon
+    if not dt:
+        raise ValueError("Cannot encode an empty batch")
+    return {
+        "v": BATCH_VERSION,
+        "driver_id": driver_id,
+        "vehicle": vehicle,
+        "address": address,
+        "t0": t0,
+        "lat0": lat0,
+        "lon0": lon0,
+        "dt": dt,
+        "dlat": dlat,
+        "dlon": dlon,
+    }
+
+
+def decode_fixes(batch):
+    """Validate and decode a batch in one pass; returns [(timestamp, latitude, longitude), ...].
+
+    Raises ValueError on anything malformed so the caller can reject the
+    whole batch.
+    """
+    if not isinstance(batch, dict) or batch.get("v") != BATCH_VERSION:
+        raise ValueError("Unsupported batch version")
+    try:
+        t, lat, lon = int(batch["t0"]), int(batch["lat0"]), int(batch["lon0"])
+        dt, dlat, dlon = batch["dt"], batch["dlat"], batch["dlon"]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Batch is missing t0/lat0/lon0/dt/dlat/dlon")
+    if not (isinstance(dt, list) and isinstance(dlat, list) and isinstance(dlon, list)):
+        raise ValueError("dt, dlat and dlon must be lists")
+    if not dt or not len(dt) == len(dlat) == len(dlon):
+        raise ValueError("dt, dlat and dlon must be non-empty and of equal length")
+
+    fixes = []
+    for step_t, step_lat, step_lon in zip(dt, dlat, dlon):
+        if type(step_t) is not int or type(step_lat) is not int or type(step_lon) is not int:
+            raise ValueError("Deltas must be integers")
+        t += step_t
+        lat += step_lat
+        lon += step_lon
+        if not (-90 * COORD_SCALE <= lat <= 90 * COORD_SCALE and -180 * COORD_SCALE <= lon <= 180 * COORD_SCALE):
+            raise ValueError("Coordinate out of range")
+        fixes.append((t / 1000, lat / COORD_SCALE, lon / COORD_SCALE))
+    return fixes
+
+
+class LocationBatcher:
+    """Buffers location fixes and posts them to /location_batch through the dispatcher.
+
+    A batch goes out when `max_fixes` fixes are buffered or the oldest one
+    is `max_age` seconds old, whichever comes first.
+    """
+
+    def __init__(self, dispatcher, driver_id, max_fixes=20, max_age=5.0, compress=False, vehicle=None):
+        self.dispatcher = dispatcher
+        self.driver_id = driver_id
+        self.vehicle = vehicle
+        self.max_fixes = max_fixes
+        self.max_age = max_age
+        self.compress = compress
+        self.fixes = []
+        self.address = None
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="location-batcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def add(self, latitude, longitude, address=None, timestamp=None):
+        with self._lock:
+            self.fixes.append((timestamp or time.time(), latitude, longitude))
+            if address is not None:
+                self.address = address
+            full = len(self.fixes) >= self.max_fixes
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            fixes, self.fixes = self.fixes, []
+            address = self.address
+        if not fixes:
+            return
+        self.dispatcher.submit("/location_batch", encode_fixes(fixes, self.driver_id, address, self.vehicle),
+                               compress=self.compress)
+        self.batches += 1
+
+    def _run(self):
+        # Time trigger: wake a few times per max_age and ship anything old enough
+        while not self._stopped.wait(self.max_age / 4):
+            with self._lock:
+                due = bool(self.fixes) and time.time() - self.fixes[0][0] >= self.max_age
+            if due:
+                self.flush()
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
@@ -0,0 +1,144 @@
+import os
+import json
+import datetime
+import numpy as np
+
+# Recorded EAR traces, one set of files per driving session
+TRACE_DIR = "ear_traces"
+
+# Columns of a trace array: one row per sample fed to the state machine (NaN EAR = no face).
+# FACE is the per-face smoothing slot (faces ordered left to right), NO_FACE on rows without a face;
+# traces recorded before the column existed have only the first three.
+TIME, RAW_EAR, SMOOTHED_EAR, FACE = 0, 1, 2, 3
+COLUMNS = 4
+NO_FACE = -1
+
+LABELS = ("drowsy", "sleeping")
+
+
+def trace_base(driver_id, directory=TRACE_DIR, started_at=None):
+    """Path without extension for a new trace: <directory>/<driver>-<YYYYmmdd-HHMMSS>"""
+    started_at = started_at or datetime.datetime.now()
+    safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(driver_id))
+    return os.path.join(directory, f"{safe_id}-{started_at:%Y%m%d-%H%M%S}")
+
+
+class TraceRecorder:
+    """Records (timestamp, raw EAR, smoothed EAR, face) rows for offline threshold tuning.
+
+    Rows are buffered in a preallocated block and appended to `<base>.raw`
+    as float64 bytes, so a crash loses at most one block; `close()` turns
+    the raw file into `<base>.npy`. `<base>.json` holds the calibration and
+    state machine settings the trace was recorded with.
+    """
+
+    def __init__(self, base, meta, block=4096):
+        self.base = base
+        self.rows = np.empty((block, COLUMNS), dtype=np.float64)
+        self.count = 0
+        self.total = 0
+        os.makedirs(os.path.dirname(os.path.abspath(base)), exist_ok=True)
+        with open(base + ".json", "w") as f:
+            json.dump(dict(meta, columns=COLUMNS, started_at=datetime.datetime.now().isoformat()), f, indent=2)
+        self._file = open(base + ".raw", "ab")
+
+    def add(self, timestamp, raw_ear, smoothed_ear, face=0):
+        row = self.rows[self.count]
+        row[TIME] = timestamp
+        row[RAW_EAR] = raw_ear
+        row[SMOOTHED_EAR] = smoothed_ear
+        row[FACE] = face
+        self.count += 1
+        if self.count == len(self.rows):
+            self.flush()
+
+    def flush(self):
+        if self.count:
+            self._file.write(self.rows[:self.count].tobytes())
+            self.total += self.count
+            self.count = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        finish_trace(self.base)
+
+
+def _columns(base):
+    """Row width of a trace, from its settings file (3 for traces recorded without a face column)"""
+    with open(base + ".json", "r") as f:
+        return int(json.load(f).get("columns", 3))
+
+
+def finish_trace(base):
+    """Convert `<base>.raw` (e.g. left behind by a crash) to `<base>.npy`"""
+    raw_path = base + ".raw"
+    if not os.path.exists(raw_path):
+        return
+    columns = _columns(base)
+    data = np.fromfile(raw_path, dtype=np.float64)
+    data = data[:len(data) - len(data) % columns].reshape(-1, columns)
+    np.save(base + ".npy", data)
+    os.remove(raw_path)
+
+
+def load_trace(base):
+    """(rows, meta) for a trace; rows is a read-only memory map of shape (N, columns)"""
+    if base.endswith((".npy", ".json", ".raw")):
+        base = os.path.splitext(base)[0]
+    with open(base + ".json", "r") as f:
+        meta = json.load(f)
+    if os.path.exists(base + ".npy"):
+        rows = np.load(base + ".npy", mmap_mode="r")
+    else:
+        columns = int(meta.get("columns", 3))
+        raw = np.memmap(base + ".raw", dtype=np.float64, mode="r")
+        rows = raw[:len(raw) - len(raw) % columns].reshape(-1, columns)
+    return rows, meta
+
+
+def face_tracks(rows):
+    """Rows split per face, each in time order; rows without a face are dropped (they leave the state as is)"""
+    if rows.shape[1] <= FACE:
+        return [rows]
+    faces = rows[:, FACE]
+    return [rows[faces == face] for face in np.unique(faces) if face != NO_FACE]
+
+
+def load_labels(base):
+    """Labeled segments [(start, end, label)] in trace timestamps; None if the trace is unlabeled.
+
+    `<base>.labels.json` lists {"start": s, "end": s, "label": "drowsy" | "sleeping"}
+    with times in seconds from the first sample, as read off the recording.
+    """
+    path = base + ".labels.json"
+    if not os.path.exists(path):
+        return None
+    rows, _ = load_trace(base)
+    origin = float(rows[0, TIME]) if len(rows) else 0.0
+    with open(path, "r") as f:
+        segments = json.load(f)
+    labels = []
+    for segment in segments:
+        if segment.get("label") not in LABELS:
+            raise ValueError(f"{path}: label must be one of {', '.join(LABELS)}")
+        start, end = float(segment["start"]), float(segment["end"])
+        if end < start:
+            raise ValueError(f"{path}: segment ends before it starts ({start}, {end})")
+        labels.append((origin + start, origin + end, segment["label"]))
+    return sorted(labels)
+
+
+def find_traces(paths):
+    """Trace bases under the given files / directories that have a labels file"""
+    bases = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if name.endswith(".labels.json"):
+                    bases.add(os.path.join(path, name[:-len(".labels.json")]))
+        elif path.endswith(".labels.json"):
+            bases.add(path[:-len(".labels.json")])
+        else:
+            bases.add(os.path.splitext(path)[0] if path.endswith((".npy", ".raw", ".json")) else path)
+    return sorted(bases)
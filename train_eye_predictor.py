@@ -0,0 +1,75 @@
+"""Train the 12-point eye-only landmark model used by `landmark_model: "eyes"`.
+
+Takes the iBUG 300-W training XML shipped with dlib's landmark dataset
+(http://dlib.net/files/data/ibug_300W_large_face_landmark_dataset.tar.gz),
+keeps only points 36-47 (both eyes, renumbered 00-11) and trains a
+shallower cascade than the 68-point model. The result is a fraction of
+the 68-point model's size and per-face cost; compare the two with
+`python -m benchmarks.landmarks`.
+
+Usage:
+    python train_eye_predictor.py ibug_300W_large_face_landmark_dataset/labels_ibug_300W_train.xml \\
+        --test ibug_300W_large_face_landmark_dataset/labels_ibug_300W_test.xml
+"""
+import os
+import time
+import argparse
+import multiprocessing
+import xml.etree.ElementTree as ET
+import dlib
+from ear import EYE_POINTS
+
+EYE_PREDICTOR_PATH = "./shape_predictor_eyes.dat"
+
+
+def eye_only_xml(source):
+    """Write `<source>_eyes.xml` next to `source` (image paths stay relative) with just the eye points"""
+    tree = ET.parse(source)
+    first, last = int(EYE_POINTS[0]), int(EYE_POINTS[-1])
+    for box in tree.iter("box"):
+        for part in list(box.findall("part")):
+            index = int(part.get("name"))
+            if first <= index <= last:
+                part.set("name", f"{index - first:02d}")
+            else:
+                box.remove(part)
+    target = os.path.splitext(source)[0] + "_eyes.xml"
+    tree.write(target)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("train_xml", help="dlib/imglab training XML with 68-point annotations")
+    parser.add_argument("--test", help="held-out XML to report the mean landmark error on")
+    parser.add_argument("--out", default=EYE_PREDICTOR_PATH)
+    parser.add_argument("--tree-depth", type=int, default=4)
+    parser.add_argument("--cascade-depth", type=int, default=12)
+    parser.add_argument("--nu", type=float, default=0.1)
+    parser.add_argument("--oversampling", type=int, default=20)
+    parser.add_argument("--feature-pool-size", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    options = dlib.shape_predictor_training_options()
+    options.tree_depth = args.tree_depth
+    options.cascade_depth = args.cascade_depth
+    options.nu = args.nu
+    options.oversampling_amount = args.oversampling
+    options.feature_pool_size = args.feature_pool_size
+    options.num_threads = args.threads
+    options.be_verbose = True
+
+    train_xml = eye_only_xml(args.train_xml)
+    start = time.perf_counter()
+    dlib.train_shape_predictor(train_xml, args.out, options)
+    print(f"Trained {args.out} in {time.perf_counter() - start:.0f} s "
+          f"({os.path.getsize(args.out) / 1e6:.1f} MB)")
+
+    print(f"Training error: {dlib.test_shape_predictor(train_xml, args.out):.2f} px")
+    if args.test:
+        print(f"Test error: {dlib.test_shape_predictor(eye_only_xml(args.test), args.out):.2f} px")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Threshold sweep over recorded, labeled EAR traces.
+
+Runs the driver state machine over every trace once per parameter set
+(a grid, or random samples from ranges) on a process pool, and scores
+each set against the labeled drowsy / sleeping segments: a segment is
+caught if any alert fires inside it, an alert outside every segment is a
+false alarm. Sets are ranked by missed rate + weight x false alarms/hour.
+
+Traces come from driver2.py (`ear_trace_dir` in driver_config.json) or
+replay.py --trace; label them with a `<trace>.labels.json` next to the .npy.
+
+Usage:
+    python tune.py ear_traces/
+    python tune.py ear_traces/ --awake-margin 0.8 0.85 0.9 --frames 2 3 5 --top 20
+    python tune.py ear_traces/ --random 2000 --workers 8 --out sweep.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from state_machine import DriverState, ALERT, AWAKE_MARGIN, SLEEP_MARGIN, STATE_CHANGE_FRAMES
+from traces import TIME, SMOOTHED_EAR, face_tracks, find_traces, load_trace, load_labels
+
+PARAMS = ("awake_margin", "sleep_margin", "change_frames", "drowsy_alert_threshold", "sleep_alert_threshold")
+
+# Default grid around the shipped values
+DEFAULT_GRID = {
+    "awake_margin": [0.8, AWAKE_MARGIN, 0.9],
+    "sleep_margin": [1.0, SLEEP_MARGIN, 1.2],
+    "change_frames": [2, STATE_CHANGE_FRAMES, 5],
+    "drowsy_alert_threshold": [5, 7, 10],
+    "sleep_alert_threshold": [3, 5, 8],
+}
+
+# Ranges for --random: (low, high, integer)
+RANDOM_RANGES = {
+    "awake_margin": (0.7, 1.0, False),
+    "sleep_margin": (0.9, 1.4, False),
+    "change_frames": (1, 10, True),
+    "drowsy_alert_threshold": (2.0, 15.0, False),
+    "sleep_alert_threshold": (1.0, 10.0, False),
+}
+
+_traces = []
+
+
+def _load_traces(bases):
+    """Pool initializer: map every trace once per worker process"""
+    for base in bases:
+        rows, meta = load_trace(base)
+        labels = load_labels(base) or []
+        starts = np.array([start for start, _, _ in labels], dtype=np.float64)
+        ends = np.array([end for _, end, _ in labels], dtype=np.float64)
+        hours = (float(rows[-1, TIME]) - float(rows[0, TIME])) / 3600 if len(rows) else 0.0
+        # Each face gets its own state machine, as interleaved faces would blend into one EAR series
+        tracks = [(np.ascontiguousarray(track[:, TIME]), np.ascontiguousarray(track[:, SMOOTHED_EAR]))
+                  for track in face_tracks(rows)]
+        _traces.append((tracks, meta["awake_ear"], meta["sleep_ear"], starts, ends, hours))
+
+
+def score_alerts(alerts, starts, ends):
+    """(caught segments, detection latencies, false alarms) for sorted alert times"""
+    if len(starts) and len(alerts):
+        # First alert at or after each segment start, caught if it is still inside the segment
+        first = np.searchsorted(alerts, starts)
+        in_range = first < len(alerts)
+        caught = np.zeros(len(starts), dtype=bool)
+        caught[in_range] = alerts[first[in_range]] <= ends[in_range]
+        latencies = alerts[first[caught]] - starts[caught]
+        # Alerts inside any segment (segments sorted by start; overlaps handled by the running max end)
+        segment = np.searchsorted(starts, alerts, side="right") - 1
+        reach = np.maximum.accumulate(ends)
+        inside = (segment >= 0) & (alerts <= reach[np.maximum(segment, 0)])
+        false_alarms = int(np.count_nonzero(~inside))
+    else:
+        caught = np.zeros(len(starts), dtype=bool)
+        latencies = np.empty(0)
+        false_alarms = len(alerts)
+    return int(np.count_nonzero(caught)), latencies, false_alarms
+
+
+def evaluate(param_sets, false_alarm_weight):
+    """Score a chunk of parameter sets; the trace loop is outermost so each trace is read once"""
+    totals = [{"segments": 0, "caught": 0, "false_alarms": 0, "hours": 0.0, "latency": 0.0}
+              for _ in param_sets]
+    for tracks, awake_ear, sleep_ear, starts, ends, hours in _traces:
+        for params, total in zip(param_sets, totals):
+            alert_times = []
+            for timestamps, ears in tracks:
+                machine = DriverState(awake_ear, sleep_ear, **params)
+                _, events = machine.run(timestamps, ears)
+                alert_times.extend(event.timestamp for event in events if event.kind == ALERT)
+            # An alert from any face in the cab counts, as it would live
+            alerts = np.array(sorted(alert_times))
+            caught, latencies, false_alarms = score_alerts(alerts, starts, ends)
+            total["segments"] += len(starts)
+            total["caught"] += caught
+            total["false_alarms"] += false_alarms
+            total["hours"] += hours
+            total["latency"] += float(latencies.sum())
+
+    results = []
+    for params, total in zip(param_sets, totals):
+        missed_rate = 1 - total["caught"] / total["segments"] if total["segments"] else 0.0
+        false_alarm_rate = total["false_alarms"] / total["hours"] if total["hours"] else 0.0
+        results.append(dict(
+            params,
+            missed_rate=round(missed_rate, 4),
+            false_alarms_per_hour=round(false_alarm_rate, 4),
+            mean_latency=round(total["latency"] / total["caught"], 3) if total["caught"] else None,
+            cost=round(missed_rate + false_alarm_weight * false_alarm_rate, 4),
+        ))
+    return results
+
+
+def grid_sets(grid):
+    return [dict(zip(PARAMS, values)) for values in itertools.product(*(grid[name] for name in PARAMS))]
+
+
+def random_sets(count, seed):
+    rng = random.Random(seed)
+    sets = []
+    for _ in range(count):
+        params = {}
+        for name, (low, high, integer) in RANDOM_RANGES.items():
+            params[name] = rng.randint(low, high) if integer else round(rng.uniform(low, high), 3)
+        sets.append(params)
+    return sets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="trace directories or individual traces")
+    parser.add_argument("--awake-margin", type=float, nargs="+")
+    parser.add_argument("--sleep-margin", type=float, nargs="+")
+    parser.add_argument("--frames", type=int, nargs="+", help="state change frames")
+    parser.add_argument("--drowsy-alert", type=float, nargs="+", help="drowsy alert threshold (s)")
+    parser.add_argument("--sleep-alert", type=float, nargs="+", help="sleep alert threshold (s)")
+    parser.add_argument("--random", type=int, help="sample this many sets from RANDOM_RANGES instead of a grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--false-alarm-weight", type=float, default=0.2,
+                        help="cost of one false alarm per hour, in missed-segment fraction")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", help="write every scored set to this JSON file")
+    args = parser.parse_args()
+
+    bases = [base for base in find_traces(args.paths) if os.path.exists(base + ".labels.json")]
+    if not bases:
+        raise SystemExit("No labeled traces found (expected <trace>.labels.json next to each .npy)")
+
+    if args.random:
+        param_sets = random_sets(args.random, args.seed)
+    else:
+        grid = dict(DEFAULT_GRID)
+        for name, values in (("awake_margin", args.awake_margin), ("sleep_margin", args.sleep_margin),
+                             ("change_frames", args.frames), ("drowsy_alert_threshold", args.drowsy_alert),
+                             ("sleep_alert_threshold", args.sleep_alert)):
+            if values:
+                grid[name] = values
+        param_sets = grid_sets(grid)
+
+    workers = max(1, min(args.workers or 1, len(param_sets)))
+    # A few chunks per worker keeps the pool balanced without re-reading traces per set
+    chunk = max(1, len(param_sets) // (workers * 4))
+    chunks = [param_sets[i:i + chunk] for i in range(0, len(param_sets), chunk)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_traces, initargs=(bases,)) as pool:
+        futures = [pool.submit(evaluate, c, args.false_alarm_weight) for c in chunks]
+        results = [result for future in futures for result in future.result()]
+    elapsed = time.perf_counter() - start
+
+    # Ties go to the set that alerts sooner
+    results.sort(key=lambda r: (r["cost"], r["missed_rate"],
+                                r["mean_latency"] if r["mean_latency"] is not None else float("inf")))
+    print(f"{len(param_sets)} parameter sets x {len(bases)} traces in {elapsed:.1f} s on {workers} workers",
+          file=sys.stderr)
+    header = f"{'cost':>7} {'missed':>7} {'FA/h':>7} {'lat s':>6}  " + " ".join(f"{p:>22}" for p in PARAMS)
+    print(header)
+    for r in results[:args.top]:
+        latency = f"{r['mean_latency']:6.2f}" if r["mean_latency"] is not None else f"{'-':>6}"
+        print(f"{r['cost']:7.3f} {r['missed_rate']:7.3f} {r['false_alarms_per_hour']:7.2f} {latency}  "
+              + " ".join(f"{r[p]:>22}" for p in PARAMS))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    best = results[0]
+    print("\nBest settings for driver_config.json:")
+    print(json.dumps({
+        "awake_margin": best["awake_margin"],
+        "sleep_margin": best["sleep_margin"],
+        "state_change_frames": best["change_frames"],
+        "drowsy_alert_threshold": best["drowsy_alert_threshold"],
+        "sleep_alert_threshold": best["sleep_alert_threshold"],
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+# Persistent location watcher: prints one JSON line per reading until killed.
+# Usage: watch_location.ps1 [interval_ms]
+param([int]$IntervalMs = 1000)
+
+Add-Type -AssemblyName System.Device
+$GeoWatcher = New-Object System.Device.Location.GeoCoordinateWatcher
+$GeoWatcher.Start()
+
+while ($true) {
+    $location = $GeoWatcher.Position.Location
+    if ($GeoWatcher.Status -ne 'Ready' -or $location.IsUnknown) {
+        [Console]::Out.WriteLine('{"error": "Location unknown"}')
+    } else {
+        $lat = $location.Latitude.ToString([System.Globalization.CultureInfo]::InvariantCulture)
+        $lon = $location.Longitude.ToString([System.Globalization.CultureInfo]::InvariantCulture)
+        [Console]::Out.WriteLine("{""error"": null, ""latitude"": $lat, ""longitude"": $lon}")
+    }
+    [Console]::Out.Flush()
+    Start-Sleep -Milliseconds $IntervalMs
+}